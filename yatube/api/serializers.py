@@ -0,0 +1,51 @@
+from django.core.files.storage import default_storage
+
+# Публичное имя поля -> путь для .values().
+POST_FIELDS = {
+    "id": "pk",
+    "text": "text",
+    "created": "created",
+    "author": "author__username",
+    "group": "group__slug",
+    "image": "image",
+}
+COMMENT_FIELDS = {
+    "id": "pk",
+    "author": "author__username",
+    "text": "text",
+    "created": "created",
+}
+# Поля, без которых нельзя построить курсор.
+CURSOR_FIELDS = ("pk", "created")
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def parse_fields(value, available):
+    """Разбирает `?fields=a,b` в список публичных имён полей."""
+    if not value:
+        return list(available)
+    fields = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = set(fields) - set(available)
+    if unknown:
+        raise FieldsError(
+            f"Неизвестные поля: {', '.join(sorted(unknown))}.")
+    return fields
+
+
+def value_paths(fields, available, extra=()):
+    """Пути для .values() по запрошенным полям и обязательным extra."""
+    paths = [available[name] for name in fields]
+    return paths + [path for path in extra if path not in paths]
+
+
+def to_dict(row, fields, available):
+    """Собирает компактный словарь из строки .values()."""
+    data = {name: row[available[name]] for name in fields}
+    if data.get("image"):
+        data["image"] = default_storage.url(data["image"])
+    elif "image" in data:
+        data["image"] = None
+    return data
@@ -0,0 +1,94 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(username="auth")
+        cls.user = User.objects.create_user(username="user")
+        cls.group = Group.objects.create(
+            title="Тестовая группа",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.auth,
+                text=f"Тестовый пост {i}",
+                group=cls.group if i % 2 else None
+            ) for i in range(3)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.user, text="Комментарий")
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    @override_settings(COUNT_POSTS=2)
+    def test_index_cursor_pagination(self):
+        """Лента отдаётся страницами по курсору от новых к старым."""
+        response = self.guest_client.get(reverse("api:index"))
+        data = response.json()
+        self.assertEqual(
+            [post["id"] for post in data["results"]],
+            [self.posts[2].pk, self.posts[1].pk]
+        )
+        data = self.guest_client.get(
+            reverse("api:index"), {"after": data["next"]}).json()
+        self.assertEqual(
+            [post["id"] for post in data["results"]], [self.posts[0].pk])
+        self.assertIsNone(data["next"])
+
+    def test_sparse_fieldsets(self):
+        """Параметр fields ограничивает набор полей."""
+        response = self.guest_client.get(
+            reverse("api:group_list", kwargs={"slug": self.group.slug}),
+            {"fields": "text,author"}
+        )
+        self.assertEqual(response.json()["results"], [
+            {"text": self.posts[1].text, "author": self.auth.username}
+        ])
+        response = self.guest_client.get(
+            reverse("api:index"), {"fields": "password"})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_post_detail_with_comments(self):
+        response = self.guest_client.get(reverse(
+            "api:post_detail", kwargs={"post_id": self.posts[0].pk}))
+        data = response.json()
+        self.assertEqual(data["text"], self.posts[0].text)
+        self.assertEqual(data["comments"][0]["author"], self.user.username)
+
+    def test_batch_keeps_order_and_reports_missing(self):
+        ids = [self.posts[0].pk, 0, self.posts[2].pk]
+        response = self.guest_client.get(
+            reverse("api:post_batch"),
+            {"ids": ",".join(map(str, ids)), "fields": "id"}
+        )
+        self.assertEqual(response.json(), {
+            "results": [{"id": self.posts[0].pk}, {"id": self.posts[2].pk}],
+            "missing": [0]
+        })
+
+    def test_follow_requires_auth(self):
+        response = self.guest_client.get(reverse("api:follow_index"))
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+        Follow.objects.create(user=self.user, author=self.auth)
+        response = self.authorized_client.get(reverse("api:follow_index"))
+        self.assertEqual(len(response.json()["results"]), len(self.posts))
+
+    def test_unknown_profile_not_found(self):
+        response = self.guest_client.get(
+            reverse("api:profile", kwargs={"username": "nobody"}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
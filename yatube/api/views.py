@@ -0,0 +1,140 @@
+from http import HTTPStatus
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from posts.feeds import after_cursor, decode_cursor, encode_cursor
+from posts.models import Comment, Group, Post, User
+
+from .serializers import (COMMENT_FIELDS, CURSOR_FIELDS, POST_FIELDS,
+                          FieldsError, parse_fields, to_dict, value_paths)
+
+
+def error(message, status):
+    return JsonResponse({"detail": message}, status=status)
+
+
+def not_found():
+    return error("Не найдено.", HTTPStatus.NOT_FOUND)
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get("limit", settings.COUNT_POSTS))
+    except ValueError:
+        limit = settings.COUNT_POSTS
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+def post_list(request, posts):
+    """Страница постов с курсорной пагинацией по (-created, -id)."""
+    try:
+        fields = parse_fields(request.GET.get("fields"), POST_FIELDS)
+    except FieldsError as exc:
+        return error(str(exc), HTTPStatus.BAD_REQUEST)
+    cursor = None
+    if request.GET.get("after"):
+        cursor = decode_cursor(request.GET["after"])
+        if cursor is None:
+            return error("Неверный курсор.", HTTPStatus.BAD_REQUEST)
+    limit = get_limit(request)
+    rows = list(
+        after_cursor(posts, cursor).values(
+            *value_paths(fields, POST_FIELDS, CURSOR_FIELDS)
+        )[:limit + 1]
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created"], rows[-1]["pk"])
+    return JsonResponse({
+        "results": [to_dict(row, fields, POST_FIELDS) for row in rows],
+        "next": next_cursor
+    })
+
+
+@require_GET
+def index(request):
+    return post_list(request, Post.objects.all())
+
+
+@require_GET
+def group_posts(request, slug):
+    group_id = Group.objects.filter(
+        slug=slug).values_list("pk", flat=True).first()
+    if group_id is None:
+        return not_found()
+    return post_list(request, Post.objects.filter(group_id=group_id))
+
+
+@require_GET
+def profile(request, username):
+    author_id = User.objects.filter(
+        username=username).values_list("pk", flat=True).first()
+    if author_id is None:
+        return not_found()
+    return post_list(request, Post.objects.filter(author_id=author_id))
+
+
+@require_GET
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return error("Требуется авторизация.", HTTPStatus.UNAUTHORIZED)
+    return post_list(
+        request,
+        Post.objects.filter(author__following__user=request.user)
+    )
+
+
+@require_GET
+def post_detail(request, post_id):
+    available = dict(POST_FIELDS, comments=None)
+    try:
+        fields = parse_fields(request.GET.get("fields"), available)
+    except FieldsError as exc:
+        return error(str(exc), HTTPStatus.BAD_REQUEST)
+    post_fields = [name for name in fields if name != "comments"]
+    row = Post.objects.filter(pk=post_id).values(
+        *value_paths(post_fields, POST_FIELDS, ("pk",))).first()
+    if row is None:
+        return not_found()
+    data = to_dict(row, post_fields, POST_FIELDS)
+    if "comments" in fields:
+        comments = Comment.objects.filter(post_id=post_id).order_by(
+            "created", "pk").values(*COMMENT_FIELDS.values())
+        data["comments"] = [
+            to_dict(comment, COMMENT_FIELDS, COMMENT_FIELDS)
+            for comment in comments
+        ]
+    return JsonResponse(data)
+
+
+@require_GET
+def post_batch(request):
+    """Посты по списку `?ids=1,2,3` одним запросом в порядке ids."""
+    try:
+        fields = parse_fields(request.GET.get("fields"), POST_FIELDS)
+        ids = list(dict.fromkeys(
+            int(pk) for pk in request.GET.get("ids", "").split(",") if pk
+        ))
+    except FieldsError as exc:
+        return error(str(exc), HTTPStatus.BAD_REQUEST)
+    except ValueError:
+        return error("ids — список чисел через запятую.",
+                     HTTPStatus.BAD_REQUEST)
+    if len(ids) > settings.API_BATCH_LIMIT:
+        return error(
+            f"Не больше {settings.API_BATCH_LIMIT} ids за запрос.",
+            HTTPStatus.BAD_REQUEST
+        )
+    rows = {
+        row["pk"]: row for row in Post.objects.filter(pk__in=ids).values(
+            *value_paths(fields, POST_FIELDS, ("pk",)))
+    }
+    return JsonResponse({
+        "results": [
+            to_dict(rows[pk], fields, POST_FIELDS)
+            for pk in ids if pk in rows
+        ],
+        "missing": [pk for pk in ids if pk not in rows]
+    })
@@ -0,0 +1,259 @@
+import pickle
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Хранилища CompressedLRUCache по LOCATION: экземпляры бэкенда создаются
+# на каждый поток, а данные у них общие, как у LocMemCache.
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class CompressedLRUCache(BaseCache):
+    """Кеш в памяти процесса с бюджетом в байтах.
+
+    Значения больше COMPRESS_MIN_SIZE байт после pickle сжимаются zlib
+    (COMPRESS_LEVEL, по умолчанию быстрый 1). Когда сумма размеров
+    превышает MAX_BYTES, вытесняются давно не читанные записи. stats()
+    возвращает попадания, промахи, вытеснения и занятые байты.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._max_bytes = options.get("MAX_BYTES", 32 * 2 ** 20)
+        self._compress_min_size = options.get("COMPRESS_MIN_SIZE", 1024)
+        self._compress_level = options.get("COMPRESS_LEVEL", 1)
+        with _stores_lock:
+            self._cache, self._stats, self._lock = _stores.setdefault(
+                name, (OrderedDict(), Counter(), threading.Lock()))
+
+    def _pack(self, value):
+        raw = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(raw) >= self._compress_min_size:
+            packed = zlib.compress(raw, self._compress_level)
+            if len(packed) < len(raw):
+                return packed, True, len(raw)
+        return raw, False, len(raw)
+
+    def _drop(self, key):
+        """Удаляет запись; вызывается под self._lock."""
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._stats["bytes"] -= len(entry[0])
+            self._stats["raw_bytes"] -= entry[2]
+        return entry
+
+    def _live_entry(self, key):
+        """Неистёкшая запись; вызывается под self._lock."""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires = entry[3]
+        if expires is not None and expires <= time.time():
+            self._drop(key)
+            return None
+        return entry
+
+    def _put(self, key, packed, expires):
+        """Записывает упакованное значение; вызывается под self._lock."""
+        blob, compressed, raw_size = packed
+        self._drop(key)
+        if len(blob) > self._max_bytes:
+            return
+        self._cache[key] = (blob, compressed, raw_size, expires)
+        self._stats["bytes"] += len(blob)
+        self._stats["raw_bytes"] += raw_size
+        while self._stats["bytes"] > self._max_bytes:
+            self._drop(next(iter(self._cache)))
+            self._stats["evictions"] += 1
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return default
+            self._cache.move_to_end(key)
+            self._stats["hits"] += 1
+        blob, compressed = entry[:2]
+        return pickle.loads(zlib.decompress(blob) if compressed else blob)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        packed = self._pack(value)
+        with self._lock:
+            self._put(key, packed, self.get_backend_timeout(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        # Упаковка до блокировки: проверка и запись идут под одной
+        # блокировкой, и из одновременных add побеждает один.
+        packed = self._pack(value)
+        with self._lock:
+            if self._live_entry(key) is not None:
+                return False
+            self._put(key, packed, self.get_backend_timeout(timeout))
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                return False
+            self._cache[key] = entry[:3] + (
+                self.get_backend_timeout(timeout),)
+            return True
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            return self._live_entry(key) is not None
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._lock:
+            self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._stats["bytes"] = self._stats["raw_bytes"] = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self._stats["hits"],
+                "misses": self._stats["misses"],
+                "evictions": self._stats["evictions"],
+                "entries": len(self._cache),
+                "bytes": self._stats["bytes"],
+                "raw_bytes": self._stats["raw_bytes"],
+                "max_bytes": self._max_bytes,
+            }
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кеш: кеш в памяти процесса перед общим кешем.
+
+    Общий кеш (OPTIONS["SHARED"], алиас из CACHES) хранит значение
+    вместе с меткой версии, которая меняется при каждой записи, и саму
+    метку отдельным ключом. Локальная копия (OPTIONS["LOCAL"], обычно
+    CompressedLRUCache) отдаётся, только если метка в общем кеше та же:
+    каждое попадание читает лишь короткую метку, а значение
+    перечитывается, если его изменил или удалил другой процесс.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._shared_alias = options.get("SHARED", "shared")
+        self._local_alias = options.get("LOCAL", "local")
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    @property
+    def local(self):
+        return caches[self._local_alias]
+
+    @staticmethod
+    def stamp_key(key):
+        return f"{key}:stamp"
+
+    def _remember(self, key, pickled, stamp, expires):
+        now = time.time()
+        entry = (pickled, stamp, expires)
+        self.local.set(
+            key, entry, None if expires is None else max(expires - now, 0))
+
+    def _forget(self, key):
+        self.local.delete(key)
+
+    def _local_entry(self, key):
+        return self.local.get(key)
+
+    def _expires(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return None if timeout is None else time.time() + timeout
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        entry = self._local_entry(key)
+        if entry is not None:
+            pickled, stamp, expires = entry
+            if expires is not None and expires <= time.time():
+                self._forget(key)
+            elif self.shared.get(self.stamp_key(key)) == stamp:
+                return pickle.loads(pickled)
+        payload = self.shared.get(key)
+        if payload is None:
+            self._forget(key)
+            return default
+        stamp, expires, pickled = payload
+        self._remember(key, pickled, stamp, expires)
+        return pickle.loads(pickled)
+
+    def _write(self, key, value, timeout, add=False):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        stamp = uuid.uuid4().hex
+        expires = self._expires(timeout)
+        payload = (stamp, expires, pickled)
+        if add:
+            if not self.shared.add(key, payload, timeout):
+                return False
+        else:
+            self.shared.set(key, payload, timeout)
+        self.shared.set(self.stamp_key(key), stamp, timeout)
+        self._remember(key, pickled, stamp, expires)
+        return True
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write(key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._write(key, value, timeout, add=True)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        payload = self.shared.get(key)
+        if payload is None:
+            return False
+        stamp, _, pickled = payload
+        expires = self._expires(timeout)
+        self.shared.set(key, (stamp, expires, pickled), timeout)
+        self.shared.set(self.stamp_key(key), stamp, timeout)
+        self._remember(key, pickled, stamp, expires)
+        return True
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        # Без метки другие процессы перечитают ключ и увидят промах.
+        self.shared.delete_many([key, self.stamp_key(key)])
+        self._forget(key)
+
+    def clear(self):
+        self.shared.clear()
+        self.local.clear()
@@ -0,0 +1,138 @@
+import gzip
+import re
+import zlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .static import accepted_encodings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript",
+    "application/x-ndjson", "application/xml", "image/svg+xml",
+)
+# Динамические ответы сжимаются быстрее, чем статика при сборке.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+_PRESERVED = re.compile(
+    rb"(<(pre|textarea|script|style)\b.*?</\2>)", re.IGNORECASE | re.DOTALL)
+_LINE_BREAKS = re.compile(rb"[ \t]*\n\s*")
+_SPACES = re.compile(rb"[ \t]{2,}")
+
+
+def minify_html(content):
+    """Схлопывает пробелы и пустые строки вне pre, textarea, script и
+    style. Одиночные пробелы между тегами сохраняются: от них зависит
+    вёрстка строчных элементов.
+    """
+    parts = _PRESERVED.split(content)
+    # split возвращает текст, блок целиком и имя тега по очереди.
+    for index in range(0, len(parts), 3):
+        parts[index] = _SPACES.sub(
+            b" ", _LINE_BREAKS.sub(b"\n", parts[index]))
+    return b"".join(
+        part for index, part in enumerate(parts) if index % 3 != 2)
+
+
+def choose_encoding(request):
+    """br или gzip с наибольшим q из Accept-Encoding, q=0 — запрет."""
+    accepted = accepted_encodings(request)
+    default = accepted.get("*", 0.0)
+    names = ("br", "gzip") if brotli is not None else ("gzip",)
+    best, best_quality = None, 0.0
+    for name in names:
+        quality = accepted.get(name, default)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def compress_stream(chunks, encoding):
+    """Сжимает поток, отдавая сжатые данные после каждого куска."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    # wbits 16 + MAX_WBITS: поток в формате gzip, а не zlib.
+    compressor = zlib.compressobj(
+        GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def is_compressible(response):
+    content_type = response.get("Content-Type", "").lower()
+    return (
+        response.status_code == 200
+        and not response.has_header("Content-Encoding")
+        and content_type.startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+def compress_response(request, response):
+    """Минифицирует HTML (если включено MINIFY_HTML) и сжимает ответ
+    br или gzip, если клиент их принимает.
+
+    Обычные ответы меньше COMPRESS_MIN_SIZE не сжимаются, потоковые
+    сжимаются по мере отдачи.
+    """
+    if not is_compressible(response):
+        return response
+    if (not response.streaming and settings.MINIFY_HTML
+            and response["Content-Type"].startswith("text/html")):
+        response.content = minify_html(response.content)
+        response["Content-Length"] = str(len(response.content))
+    # Ответ зависит от Accept-Encoding, даже если сжат не будет.
+    patch_vary_headers(response, ("Accept-Encoding",))
+    encoding = choose_encoding(request)
+    if encoding is None:
+        return response
+    if response.streaming:
+        response.streaming_content = compress_stream(
+            response.streaming_content, encoding)
+        del response["Content-Length"]
+    else:
+        if len(response.content) < settings.COMPRESS_MIN_SIZE:
+            return response
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+    etag = response.get("ETag")
+    if etag and etag.startswith('"'):
+        # Сжатое и исходное представления не совпадают побайтно.
+        response["ETag"] = "W/" + etag
+    response["Content-Encoding"] = encoding
+    return response
+
+
+def compress_page(view_func):
+    """Сжимает ответ представления под stale_while_revalidate: в кеш
+    страниц попадают уже сжатые байты, отдельно для каждого
+    Accept-Encoding (ответ получает Vary: Accept-Encoding).
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        return compress_response(request, view_func(request, *args, **kwargs))
+    return wrapper
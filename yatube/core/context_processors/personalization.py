@@ -0,0 +1,8 @@
+from django.conf import settings
+
+
+def personalization(request):
+    """Добавляет в контекст режим вывода личных частей страниц."""
+    return {
+        'personalization': settings.PERSONALIZATION,
+    }
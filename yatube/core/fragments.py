@@ -0,0 +1,78 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.html import format_html
+
+# Части страниц, зависящие от пользователя: имя -> (шаблон, функция
+# контекста). Функция получает запрос и ключ фрагмента строкой.
+FRAGMENTS = {}
+
+
+def register(name, template_name):
+    def decorator(context_func):
+        FRAGMENTS[name] = (template_name, context_func)
+        return context_func
+    return decorator
+
+
+def is_shared():
+    """Страницы одни на всех: личные части приходят отдельно."""
+    return settings.PERSONALIZATION != "inline"
+
+
+def page_owner(request):
+    """Пользователь, для которого собрана страница, или None, если она
+    общая для всех.
+    """
+    user = getattr(request, "user", None)
+    if is_shared() or user is None:
+        return None
+    return user.pk
+
+
+def fragment_url(name, key):
+    return reverse("fragment", args=(name,)) + "?" + urlencode({"key": key})
+
+
+def render_fragment(request, name, key):
+    template_name, context_func = FRAGMENTS[name]
+    return render_to_string(
+        template_name, context_func(request, str(key)), request)
+
+
+def include_fragment(request, name, key):
+    """HTML на месте фрагмента: сам фрагмент в режиме inline, тег
+    <esi:include> для прокси в режиме esi или заглушка, которую
+    заполняет static/js/fragments.js, в режиме js. Ответ на POST не
+    кешируется, и фрагмент встраивается сразу: отдельный запрос
+    фрагмента не видит отправленной формы.
+    """
+    mode = settings.PERSONALIZATION
+    if request.method == "POST":
+        mode = "inline"
+    if mode == "esi":
+        return format_html('<esi:include src="{}"/>', fragment_url(name, key))
+    if mode == "js":
+        return format_html(
+            '<span data-fragment="{}"></span>', fragment_url(name, key))
+    return render_fragment(request, name, key)
+
+
+def fragment(request, name):
+    """Отдельный ответ с фрагментом: его нельзя кешировать общим."""
+    if name not in FRAGMENTS:
+        raise Http404(name)
+    response = HttpResponse(
+        render_fragment(request, name, request.GET.get("key", "")))
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ("Cookie",))
+    return response
+
+
+@register("header", "fragments/header.html")
+def header_context(request, key):
+    return {"view_name": key}
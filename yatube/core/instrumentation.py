@@ -0,0 +1,151 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.core.cache import caches
+from django.template.base import Template
+
+_metrics = ContextVar("request_metrics", default=None)
+_MISSING = object()
+
+
+class RequestMetrics:
+    """Время и счётчики одного запроса по подсистемам."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.db_count = 0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_time = 0.0
+        self.cache_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.thumbnail_time = 0.0
+        self.thumbnail_count = 0
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            "total_ms": round(self.total_time * 1000, 2),
+            "db_ms": round(self.db_time * 1000, 2),
+            "db_queries": self.db_count,
+            "template_ms": round(self.template_time * 1000, 2),
+            "cache_ms": round(self.cache_time * 1000, 2),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "thumbnail_ms": round(self.thumbnail_time * 1000, 2),
+            "thumbnails": self.thumbnail_count,
+        }
+
+
+def current_metrics():
+    return _metrics.get()
+
+
+@contextmanager
+def collect_metrics():
+    metrics = RequestMetrics()
+    token = _metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _metrics.reset(token)
+
+
+def db_timer(execute, sql, params, many, context):
+    """Обёртка для connection.execute_wrapper."""
+    metrics = _metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.db_count += 1
+
+
+def _timed_template_render(render):
+    @wraps(render)
+    def wrapper(self, context):
+        metrics = _metrics.get()
+        if metrics is None:
+            return render(self, context)
+        # Вложенные include не считаются повторно.
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - started
+    return wrapper
+
+
+def _timed_cache_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        metrics = _metrics.get()
+        # Чтения нижнего уровня многоуровневого кеша не считаются.
+        if metrics is None or metrics.cache_depth:
+            return get(self, key, default=default, version=version)
+        metrics.cache_depth += 1
+        started = time.perf_counter()
+        try:
+            value = get(self, key, default=_MISSING, version=version)
+        finally:
+            metrics.cache_depth -= 1
+        metrics.cache_time += time.perf_counter() - started
+        if value is _MISSING:
+            metrics.cache_misses += 1
+            return default
+        metrics.cache_hits += 1
+        return value
+    return wrapper
+
+
+def _timed_thumbnail(get_thumbnail):
+    @wraps(get_thumbnail)
+    def wrapper(*args, **kwargs):
+        metrics = _metrics.get()
+        if metrics is None:
+            return get_thumbnail(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return get_thumbnail(*args, **kwargs)
+        finally:
+            metrics.thumbnail_time += time.perf_counter() - started
+            metrics.thumbnail_count += 1
+    return wrapper
+
+
+def _patch(owner, name, decorator):
+    method = getattr(owner, name)
+    if getattr(method, "_instrumented", False):
+        return
+    patched = decorator(method)
+    patched._instrumented = True
+    setattr(owner, name, patched)
+
+
+def install(cache_aliases):
+    """Подключает замеры шаблонов, кеша и миниатюр sorl.
+
+    Базы данных замеряются отдельно, через execute_wrapper в
+    ServerTimingMiddleware.
+    """
+    _patch(Template, "render", _timed_template_render)
+    for alias in cache_aliases:
+        _patch(type(caches[alias]), "get", _timed_cache_get)
+    try:
+        from sorl.thumbnail.base import ThumbnailBackend
+    except ImportError:
+        return
+    _patch(ThumbnailBackend, "get_thumbnail", _timed_thumbnail)
@@ -0,0 +1,58 @@
+import logging
+
+from core.fragments import include_fragment
+from core.templatetags.pagination import elided_page_range
+from core.templatetags.user_filters import addclass
+from django.template import defaultfilters
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.timezone import template_localtime
+from jinja2 import Environment, pass_context
+from markupsafe import Markup
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+logger = logging.getLogger("sorl.thumbnail")
+
+
+def url(viewname, *args, **kwargs):
+    """Аналог тега {% url %}: url("posts:profile", post.author)."""
+    return reverse(viewname, args=args, kwargs=kwargs)
+
+
+def date(value, arg=None):
+    """Фильтр date с переводом в текущий часовой пояс, как в Django."""
+    return defaultfilters.date(template_localtime(value), arg)
+
+
+def thumbnail(file, geometry, **options):
+    """Аналог тега {% thumbnail %}: миниатюра или None, если файла нет
+    или её не удалось построить.
+    """
+    if not file:
+        return None
+    try:
+        return get_thumbnail(file, geometry, **options)
+    except Exception:
+        if thumbnail_settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception("Thumbnail failed for %s", file)
+        return None
+
+
+@pass_context
+def fragment(context, name, key):
+    """Аналог тега {% fragment %}: личная часть страницы."""
+    return Markup(include_fragment(context["request"], name, key))
+
+
+def environment(**options):
+    env = Environment(**options)
+    env.globals.update(url=url, static=static, fragment=fragment)
+    env.filters.update(
+        date=date,
+        thumbnail=thumbnail,
+        addclass=addclass,
+        elided_page_range=elided_page_range,
+    )
+    return env
@@ -0,0 +1,50 @@
+import time
+
+from core.sessions import SessionStore, sweep_expired
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+PURGE_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет истёкшие сессии из БД пачками, не блокируя таблицу "
+        "одним большим DELETE, как clearsessions, вместе с их записями "
+        "в кеше сессий, и истёкшие файлы этого кеша."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=PURGE_BATCH_SIZE,
+            help="Сколько сессий удалять одним запросом."
+        )
+        parser.add_argument(
+            "--pause", type=float, default=0,
+            help="Пауза между пачками в секундах."
+        )
+
+    def handle(self, *args, **options):
+        # Граница фиксируется, чтобы не гоняться за сессиями, истекающими
+        # во время чистки.
+        expired = Session.objects.filter(expire_date__lt=timezone.now())
+        cache = caches[settings.SESSION_CACHE_ALIAS]
+        total = 0
+        while True:
+            keys = list(expired.values_list(
+                "pk", flat=True)[:options["batch_size"]])
+            deleted, _ = Session.objects.filter(pk__in=keys).delete()
+            cache.delete_many([
+                cache_key for key in keys
+                for cache_key in SessionStore.cache_keys(key)
+            ])
+            total += deleted
+            if len(keys) < options["batch_size"]:
+                break
+            time.sleep(options["pause"])
+        self.stdout.write(f"Удалено сессий: {total}")
+        self.stdout.write(
+            f"Удалено истёкших записей кеша: {sweep_expired(cache)}")
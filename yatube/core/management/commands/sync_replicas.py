@@ -0,0 +1,53 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Копирует основную SQLite-базу в реплики из DATABASE_REPLICAS "
+        "онлайн-бэкапом: читатели реплик видят целостный снимок."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Повторять копирование каждые N секунд; ошибки SQLite "
+                 "записываются в stderr, и копирование повторяется."
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("Реплики не настроены: SQLITE_REPLICAS = 0.")
+        for alias in ["default", *settings.DATABASE_REPLICAS]:
+            if not settings.DATABASES[alias]["ENGINE"].endswith("sqlite3"):
+                raise CommandError(f"{alias}: поддерживается только SQLite.")
+        while True:
+            try:
+                self.sync()
+            except sqlite3.OperationalError as error:
+                if not options["interval"]:
+                    raise CommandError(f"Копирование не удалось: {error}")
+                # Реплику могли держать читатели или диск был занят:
+                # следующая попытка — через interval.
+                self.stderr.write(f"Копирование не удалось: {error}")
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+
+    def sync(self):
+        source = sqlite3.connect(settings.DATABASES["default"]["NAME"])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                started = time.perf_counter()
+                target = sqlite3.connect(settings.DATABASES[alias]["NAME"])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{alias}: скопировано за {elapsed:.2f} с")
+        finally:
+            source.close()
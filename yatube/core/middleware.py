@@ -0,0 +1,86 @@
+import json
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .compression import compress_response
+from .instrumentation import collect_metrics, db_timer, install
+from .query_budget import log_queries, query_shape, report
+
+logger = logging.getLogger("yatube.timing")
+
+
+class ServerTimingMiddleware:
+    """Добавляет к ответу Server-Timing и пишет строку лога с замерами
+    SQL, шаблонов, кеша и миниатюр по каждому запросу.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        install(settings.CACHES)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect_metrics() as metrics, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(db_timer))
+            response = self.get_response(request)
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        data = metrics.as_dict()
+        response["Server-Timing"] = ", ".join((
+            f'db;dur={data["db_ms"]};desc="SQL x{data["db_queries"]}"',
+            f'tpl;dur={data["template_ms"]}',
+            f'cache;dur={data["cache_ms"]};desc="hit {data["cache_hits"]} '
+            f'miss {data["cache_misses"]}"',
+            f'thumb;dur={data["thumbnail_ms"]};'
+            f'desc="x{data["thumbnails"]}"',
+            f'total;dur={data["total_ms"]}',
+        ))
+        logger.info(
+            json.dumps(dict(
+                data, view=view_name, method=request.method,
+                path=request.path, status=response.status_code
+            )),
+            extra={"view_name": view_name, "metrics": data}
+        )
+        return response
+
+
+class NPlusOneMiddleware:
+    """Сообщает о формах SQL, повторившихся за запрос не меньше
+    N_PLUS_ONE_THRESHOLD раз, — типичном следствии N+1.
+    """
+
+    def __init__(self, get_response):
+        if settings.QUERY_BUDGETS == "off":
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with log_queries() as query_log:
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match and getattr(match.func, "allow_repeated_queries", False):
+            return response
+        repeated = query_log.repeated_shapes(settings.N_PLUS_ONE_THRESHOLD)
+        if repeated:
+            report(f"Возможный N+1 в {request.path}:\n" + "\n".join(
+                f"{count} x {query_shape(shape)}"
+                for shape, count in repeated.items()
+            ))
+        return response
+
+
+class CompressionMiddleware:
+    """Сжимает ответы, которые не сжало само представление."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return compress_response(request, self.get_response(request))
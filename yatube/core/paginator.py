@@ -0,0 +1,27 @@
+ELLIPSIS = "…"
+
+
+def elided_page_range(page, on_each_side=3, on_ends=2):
+    """Номера страниц вокруг page: первые и последние страницы, соседи
+    текущей и ELLIPSIS вместо остальных.
+
+    Перенесено из Paginator.get_elided_page_range Django 3.2: число
+    ссылок не зависит от числа страниц.
+    """
+    number = page.number
+    num_pages = page.paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2:
+        yield from page.paginator.page_range
+        return
+    if number > (1 + on_each_side + on_ends) + 1:
+        yield from range(1, on_ends + 1)
+        yield ELLIPSIS
+        yield from range(number - on_each_side, number + 1)
+    else:
+        yield from range(1, number + 1)
+    if number < (num_pages - on_each_side - on_ends) - 1:
+        yield from range(number + 1, number + on_each_side + 1)
+        yield ELLIPSIS
+        yield from range(num_pages - on_ends + 1, num_pages + 1)
+    else:
+        yield from range(number + 1, num_pages + 1)
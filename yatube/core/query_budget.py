@@ -0,0 +1,161 @@
+import logging
+import re
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+
+logger = logging.getLogger("yatube.queries")
+
+# Списки плейсхолдеров IN (%s, %s, ...) разной длины — одна форма запроса.
+_PLACEHOLDER_LIST = re.compile(r"\((?:%s,\s*)+%s\)")
+_SAVEPOINTS = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+_unbudgeted = ContextVar("unbudgeted", default=False)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_shape(sql):
+    """Форма запроса: SQL без значений и длины списков IN."""
+    return _PLACEHOLDER_LIST.sub("(%s...)", sql)
+
+
+class QueryLog:
+    """Собирает SQL всех подключений, пока активен.
+
+    Точки сохранения, запросы к таблицам из settings.QUERY_BUDGET_IGNORE
+    и запросы внутри unbudgeted() не учитываются. Один запрос ко всем
+    базам с постами — шардам (settings.DATABASE_SHARDS) или основной базе
+    с репликами и архиву (settings.ARCHIVE_DATABASE) — считается одним:
+    число запросов формы берётся по базе, где их было больше всего.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.aliases = []
+        self.scattered = set(settings.DATABASE_SHARDS)
+        if settings.ARCHIVE_DATABASE:
+            self.scattered.add(settings.ARCHIVE_DATABASE)
+            if not settings.DATABASE_SHARDS:
+                self.scattered.update(
+                    ["default", *settings.DATABASE_REPLICAS])
+        self.ignore = tuple(
+            f'"{table}"' for table in settings.QUERY_BUDGET_IGNORE)
+
+    def __call__(self, execute, sql, params, many, context):
+        if not (_unbudgeted.get() or sql.startswith(_SAVEPOINTS)
+                or any(table in sql for table in self.ignore)):
+            self.queries.append(sql)
+            self.aliases.append(context["connection"].alias)
+        return execute(sql, params, many, context)
+
+    def shape_counts(self):
+        shapes = Counter()
+        shards = defaultdict(Counter)
+        for sql, alias in zip(self.queries, self.aliases):
+            if alias in self.scattered:
+                shards[query_shape(sql)][alias] += 1
+            else:
+                shapes[query_shape(sql)] += 1
+        for shape, counts in shards.items():
+            shapes[shape] += max(counts.values())
+        return shapes
+
+    def __len__(self):
+        return sum(self.shape_counts().values())
+
+    def repeated_shapes(self, threshold):
+        """Формы, повторившиеся не меньше threshold раз (признак N+1)."""
+        return {
+            shape: count for shape, count in self.shape_counts().items()
+            if count >= threshold
+        }
+
+
+@contextmanager
+def log_queries():
+    query_log = QueryLog()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(query_log))
+        yield query_log
+
+
+@contextmanager
+def unbudgeted():
+    """Разовая служебная работа внутри представления, не входящая в его
+    бюджет SQL-запросов.
+    """
+    token = _unbudgeted.set(True)
+    try:
+        yield
+    finally:
+        _unbudgeted.reset(token)
+
+
+def report(message):
+    """Сообщает о нарушении согласно settings.QUERY_BUDGETS."""
+    if settings.QUERY_BUDGETS == "raise":
+        raise QueryBudgetExceeded(message)
+    if settings.QUERY_BUDGETS == "warn":
+        logger.warning(message)
+
+
+@contextmanager
+def max_queries(limit, label="block", shapes=False):
+    """Проверяет, что внутри блока выполнено не больше limit запросов,
+    с shapes=True — не больше limit разных форм запросов.
+    """
+    with log_queries() as query_log:
+        yield query_log
+    count = len(query_log.shape_counts()) if shapes else len(query_log)
+    if count > limit:
+        unit = "форм SQL" if shapes else "SQL-запросов"
+        report(
+            f"{label}: {count} {unit} при бюджете {limit}:\n"
+            + "\n".join(query_log.queries)
+        )
+
+
+def query_budget(limit):
+    """Бюджет SQL-запросов представления вместе с рендерингом шаблона.
+
+    У представлений с allow_repeated_queries число запросов растёт с
+    данными, и бюджет ограничивает число разных форм запросов.
+    """
+    def decorator(view_func):
+        shapes = getattr(view_func, "allow_repeated_queries", False)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if settings.QUERY_BUDGETS == "off":
+                return view_func(request, *args, **kwargs)
+            with max_queries(limit, view_func.__qualname__, shapes):
+                return view_func(request, *args, **kwargs)
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
+
+
+def allow_repeated_queries(view_func):
+    """Помечает представление, которому повторяющиеся запросы нужны
+    намеренно: NPlusOneMiddleware их не сообщает.
+    """
+    view_func.allow_repeated_queries = True
+    return view_func
+
+
+class BudgetTestRunner(DiscoverRunner):
+    """Запускает тесты с QUERY_BUDGETS = "raise": превышение бюджета
+    роняет тест, а не только пишет предупреждение в лог.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGETS = "raise"
@@ -0,0 +1,93 @@
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+# Cookie с временем, до которого клиент читает с основной базы: реплики
+# могут ещё не получить его запись.
+PINNED_COOKIE = "db_pinned"
+# Записи этих приложений не видны в лентах и не закрепляют клиента.
+UNPINNED_APPS = ("sessions", "thumbnail")
+# Сессии и пользователей читают с основной базы: их могли только что
+# создать, а реплика ещё не скопирована.
+PRIMARY_APPS = ("sessions", "auth")
+
+_replica = ContextVar("replica", default=None)
+_wrote = ContextVar("wrote_to_primary", default=None)
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PINNED_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def read_replica(view_func):
+    """Чтения GET-запроса к представлению идут на одну из реплик, если
+    клиент недавно ничего не записывал.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if (request.method not in ("GET", "HEAD")
+                or not settings.DATABASE_REPLICAS or is_pinned(request)):
+            return view_func(request, *args, **kwargs)
+        # Одна реплика на запрос: реплики могут отставать по-разному.
+        token = _replica.set(random.choice(settings.DATABASE_REPLICAS))
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _replica.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Пишет в default, читает с реплик из DATABASE_REPLICAS внутри
+    представлений с read_replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return "default"
+        return _replica.get() or "default"
+
+    def db_for_write(self, model, **hints):
+        wrote = _wrote.get()
+        if wrote is not None and model._meta.app_label not in UNPINNED_APPS:
+            wrote.append(model)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики — копии default, их схему не мигрируют.
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaPinMiddleware:
+    """Ставит PINNED_COOKIE на REPLICA_STICKY_SECONDS после запроса,
+    писавшего в базу: так клиент читает свои записи.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _wrote.set([])
+        try:
+            response = self.get_response(request)
+            wrote = _wrote.get()
+        finally:
+            _wrote.reset(token)
+        if wrote:
+            until = time.time() + settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                PINNED_COOKIE, f"{until:.0f}",
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True)
+        return response
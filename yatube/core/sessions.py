@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY)
+from django.contrib.sessions.backends.cached_db import \
+    SessionStore as CachedDBStore
+
+AUTH_SESSION_KEYS = (SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY)
+
+
+class SessionStore(CachedDBStore):
+    """Сессии в кеше с отложенной записью в БД.
+
+    Новая сессия и смена пользователя сессии (вход, выход) пишутся в БД
+    сразу, остальные изменения — не чаще раза в SESSION_WRITE_BEHIND
+    секунд; между записями они живут только в кеше SESSION_CACHE_ALIAS,
+    который не вытесняет записи.
+    """
+
+    @classmethod
+    def cache_keys(cls, session_key):
+        """Ключи сессии в кеше: данные и метка записи в БД."""
+        cache_key = cls.cache_key_prefix + session_key
+        return [cache_key, f"{cache_key}:synced"]
+
+    @property
+    def synced_key(self):
+        return self.cache_keys(self.session_key)[1]
+
+    def auth_state(self):
+        return [self._session.get(key) for key in AUTH_SESSION_KEYS]
+
+    def save(self, must_create=False):
+        if must_create or self.session_key is None:
+            super().save(must_create)
+            return
+        # Метка хранит пользователя сессии на момент записи в БД.
+        auth = self.auth_state()
+        if self._cache.get(self.synced_key) != auth:
+            super().save(must_create)
+            self._cache.set(
+                self.synced_key, auth, settings.SESSION_WRITE_BEHIND)
+            return
+        self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+
+
+def sweep_expired(cache):
+    """Удаляет истёкшие файлы FileBasedCache: сам он удаляет их, только
+    когда читает. Возвращает число удалённых.
+    """
+    removed = 0
+    if not hasattr(cache, "_list_cache_files"):
+        return removed
+    for path in cache._list_cache_files():
+        try:
+            with open(path, "rb") as cache_file:
+                removed += cache._is_expired(cache_file)
+        except FileNotFoundError:
+            pass
+    return removed
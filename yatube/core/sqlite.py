@@ -0,0 +1,18 @@
+from django.conf import settings
+
+
+def pragma_statements(pragmas):
+    return [f"PRAGMA {name} = {value}" for name, value in pragmas.items()]
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Приёмник connection_created: настраивает новое соединение SQLite
+    по SQLITE_PRAGMAS.
+
+    PRAGMA выполняются на соединении DB-API, мимо обёрток Django, и не
+    попадают в бюджеты запросов.
+    """
+    if connection.vendor != "sqlite":
+        return
+    for statement in pragma_statements(settings.SQLITE_PRAGMAS):
+        connection.connection.execute(statement)
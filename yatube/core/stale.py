@@ -0,0 +1,175 @@
+import hashlib
+import os
+import random
+import time
+import uuid
+from functools import wraps
+
+from core.fragments import page_owner
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import (get_conditional_response,
+                                patch_response_headers)
+from django.utils.http import parse_http_date_safe
+
+# Доля timeout, на которую случайно сокращается свежесть записи, чтобы
+# ключи, записанные одновременно, не устаревали одновременно.
+DEFAULT_JITTER = 0.1
+# Через сколько секунд блокировку пересборки, не снятую упавшим
+# процессом, можно забрать.
+LOCK_TIMEOUT = 10
+# Сколько ждут пересборку при полном промахе, прежде чем собрать сами.
+WAIT_TIMEOUT = 2
+WAIT_INTERVAL = 0.05
+# Заголовки условного запроса не передаются пересборке: в кеш попадает
+# полная страница, а условие проверяется по её ETag и Last-Modified.
+CONDITIONAL_HEADERS = ("HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE")
+
+
+def refresh(cache, key, build, timeout, stale, jitter):
+    value = build()
+    fresh_for = timeout * (1 - jitter * random.random())
+    cache.set(key, (value, time.time() + fresh_for), timeout + stale)
+    return value
+
+
+def lock_path(key):
+    digest = hashlib.md5(key.encode()).hexdigest()
+    return os.path.join(settings.STALE_LOCK_DIR, f"{digest}.lock")
+
+
+def acquire_lock(key):
+    """Блокировка пересборки key: файл, созданный с O_EXCL, атомарно
+    для всех процессов хоста, в отличие от add() файлового кеша.
+    Возвращает путь к файлу или None, если блокировку держит другой.
+    """
+    path = lock_path(key)
+    os.makedirs(settings.STALE_LOCK_DIR, exist_ok=True)
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except FileExistsError:
+            pass
+        try:
+            if time.time() - os.path.getmtime(path) < LOCK_TIMEOUT:
+                return None
+            # Переименование удаётся одному из забирающих блокировку.
+            stale_path = f"{path}.{uuid.uuid4().hex}"
+            os.rename(path, stale_path)
+            os.remove(stale_path)
+        except FileNotFoundError:
+            pass
+    return None
+
+
+def release_lock(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def wait_for(cache, key):
+    """Ждёт, пока запись соберёт запрос, взявший блокировку."""
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def get_or_refresh(key, build, timeout, stale=None, jitter=DEFAULT_JITTER,
+                   cache_alias="default"):
+    """Значение key из кеша или build().
+
+    Запись свежая timeout секунд (минус случайный jitter), затем ещё
+    stale секунд (по умолчанию 3 * timeout) отдаётся устаревшей. Пока
+    её пересобирает один запрос, взявший блокировку (acquire_lock),
+    остальные получают устаревшее значение; при полном промахе они ждут
+    его до WAIT_TIMEOUT секунд и затем собирают сами.
+    """
+    cache = caches[cache_alias]
+    if stale is None:
+        stale = timeout * 3
+    entry = cache.get(key)
+    if entry is not None and entry[1] > time.time():
+        return entry[0]
+    lock = acquire_lock(f"{cache_alias}:{key}")
+    if lock is not None:
+        try:
+            return refresh(cache, key, build, timeout, stale, jitter)
+        finally:
+            release_lock(lock)
+    if entry is None:
+        entry = wait_for(cache, key)
+    if entry is not None:
+        return entry[0]
+    return refresh(cache, key, build, timeout, stale, jitter)
+
+
+def page_key(request, key_prefix, vary):
+    parts = [request.build_absolute_uri(), str(page_owner(request))]
+    parts += [request.META.get(
+        "HTTP_" + header.upper().replace("-", "_"), "") for header in vary]
+    digest = hashlib.md5("|".join(parts).encode()).hexdigest()
+    return f"swr.{key_prefix}.{digest}"
+
+
+class Uncacheable(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+def stale_while_revalidate(timeout, stale=None, key_prefix="",
+                           vary=(), jitter=DEFAULT_JITTER,
+                           cache_alias="default"):
+    """Кеширует ответы GET по URL, заголовкам vary и владельцу страницы
+    (page_owner), как cache_page, но пересобирает устаревшую страницу
+    одним запросом (get_or_refresh).
+
+    Ставится над conditional_page: ETag и Last-Modified хранятся вместе с
+    телом, и 304 отдаётся по ним, а состояние страницы считается только
+    при пересборке.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view_func(request, *args, **kwargs)
+
+            def build():
+                conditions = {
+                    header: request.META.pop(header)
+                    for header in CONDITIONAL_HEADERS
+                    if header in request.META
+                }
+                try:
+                    response = view_func(request, *args, **kwargs)
+                finally:
+                    request.META.update(conditions)
+                # Страница с CSRF-токеном годится только до смены токена.
+                if (response.streaming or response.status_code != 200
+                        or request.META.get("CSRF_COOKIE_USED")):
+                    raise Uncacheable(response)
+                if hasattr(response, "render"):
+                    response.render()
+                patch_response_headers(response, timeout)
+                return response
+
+            try:
+                response = get_or_refresh(
+                    page_key(request, key_prefix, vary), build,
+                    timeout, stale, jitter, cache_alias
+                )
+            except Uncacheable as error:
+                return error.response
+            return get_conditional_response(
+                request, etag=response.get("ETag"),
+                last_modified=parse_http_date_safe(
+                    response.get("Last-Modified", "")),
+                response=response)
+        return wrapper
+    return decorator
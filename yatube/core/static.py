@@ -0,0 +1,89 @@
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+# Хешированные имена неизменяемы: браузер может не перепроверять их год.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Сжатые копии, которые пишет CompressedManifestStaticFilesStorage.
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+def is_hashed(path):
+    """path — имя с хешем содержимого из манифеста collectstatic."""
+    hashed_files = getattr(staticfiles_storage, "hashed_files", {})
+    return path in hashed_files.values()
+
+
+def accepted_encodings(request):
+    """Кодировки из Accept-Encoding с их q; "*" — для неназванных."""
+    accepted = {}
+    header = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    for part in header.split(","):
+        name, *params = (item.strip() for item in part.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+    return accepted
+
+
+def choose_encoding(request, fullpath):
+    """Сжатая копия с наибольшим q из PRECOMPRESSED, q=0 — запрет."""
+    accepted = accepted_encodings(request)
+    default = accepted.get("*", 0.0)
+    best, best_quality = (None, fullpath), 0.0
+    for name, suffix in PRECOMPRESSED:
+        quality = accepted.get(name, default)
+        if quality > best_quality and os.path.isfile(fullpath + suffix):
+            best, best_quality = (name, fullpath + suffix), quality
+    return best
+
+
+def serve(request, path):
+    """Отдаёт файл из STATIC_ROOT, по возможности заранее сжатый.
+
+    Сжатая копия выбирается по Accept-Encoding, хешированные имена
+    отдаются с Cache-Control: immutable.
+    """
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404(path)
+    if not os.path.isfile(fullpath):
+        raise Http404(path)
+    stat = os.stat(fullpath)
+    if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"),
+                              stat.st_mtime, stat.st_size):
+        return HttpResponseNotModified()
+    content_type, _ = mimetypes.guess_type(fullpath)
+    encoding, filename = choose_encoding(request, fullpath)
+    # Имя и тип — исходного файла, а не его копии .gz или .br.
+    response = FileResponse(
+        open(filename, "rb"),
+        as_attachment=False,
+        filename=os.path.basename(fullpath)
+    )
+    response["Content-Type"] = content_type or "application/octet-stream"
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    if encoding:
+        response["Content-Encoding"] = encoding
+    if any(os.path.isfile(fullpath + suffix)
+           for _, suffix in PRECOMPRESSED):
+        patch_vary_headers(response, ("Accept-Encoding",))
+    if is_hashed(path):
+        response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
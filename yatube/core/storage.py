@@ -0,0 +1,58 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (
+    ".css", ".js", ".svg", ".ico", ".txt", ".xml", ".json", ".map", ".html")
+# Меньшие файлы не выигрывают от сжатия больше, чем тратят на заголовки.
+MIN_COMPRESS_SIZE = 256
+
+
+def compressors():
+    """Суффиксы сжатых копий и функции сжатия."""
+    encoders = {".gz": lambda data: gzip.compress(data, compresslevel=9)}
+    if brotli is not None:
+        encoders[".br"] = brotli.compress
+    return encoders
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем содержимого в имени и заранее сжатыми копиями.
+
+    После collectstatic рядом с каждым текстовым файлом лежат `.gz` и,
+    если установлен brotli, `.br` — если они заметно меньше оригинала.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed_names = set()
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                processed_names.update((name, hashed_name))
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(filter(None, processed_names)):
+            self.compress(name)
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        path = self.path(name)
+        with open(path, "rb") as source:
+            data = source.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, encode in compressors().items():
+            compressed = encode(data)
+            if len(compressed) < len(data) * 0.95:
+                with open(path + suffix, "wb") as target:
+                    target.write(compressed)
+            elif os.path.exists(path + suffix):
+                os.remove(path + suffix)
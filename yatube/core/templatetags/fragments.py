@@ -0,0 +1,9 @@
+from core.fragments import include_fragment
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def fragment(context, name, key):
+    return include_fragment(context["request"], name, key)
@@ -0,0 +1,9 @@
+from core.paginator import elided_page_range as page_range
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def elided_page_range(page):
+    return list(page_range(page))
@@ -0,0 +1,38 @@
+import os
+import shutil
+import tempfile
+
+from core.query_budget import BudgetTestRunner
+from django.conf import settings
+from django.test import override_settings
+
+
+def isolated_caches(directory):
+    """CACHES из settings, где файловые кеши лежат в directory."""
+    caches = {}
+    for alias, options in settings.CACHES.items():
+        options = dict(options)
+        if options["BACKEND"].endswith("FileBasedCache"):
+            options["LOCATION"] = os.path.join(directory, alias)
+        caches[alias] = options
+    return caches
+
+
+class TestRunner(BudgetTestRunner):
+    """Тесты с файловыми кешами и блокировками пересборки во временном
+    каталоге: clear() в тестах не стирает страницы и сессии запущенного
+    приложения.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix="yatube-cache-")
+        self.isolated = override_settings(
+            CACHES=isolated_caches(self.cache_dir),
+            STALE_LOCK_DIR=os.path.join(self.cache_dir, "locks"))
+        self.isolated.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.isolated.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from unittest import mock
+
+from core.cache import CompressedLRUCache, TieredCache
+from django.conf import settings
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "tiered-tests",
+    },
+    # Локальный уровень каждого «процесса» в тестах свой.
+    **{
+        f"local-{number}": {
+            "BACKEND": "core.cache.CompressedLRUCache",
+            "LOCATION": f"tiered-tests-local-{number}",
+        }
+        for number in range(2)
+    },
+}
+
+
+@override_settings(CACHES=CACHES)
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        for alias in ("shared", "local-0", "local-1"):
+            caches[alias].clear()
+
+    def worker(self, number=0, **options):
+        """Кеш отдельного процесса с общим вторым уровнем."""
+        options.update(SHARED="shared", LOCAL=f"local-{number}")
+        return TieredCache(None, {"OPTIONS": options})
+
+    def test_value_shared_between_workers(self):
+        first, second = self.worker(), self.worker(1)
+        first.set("key", {"posts": [1, 2]})
+        self.assertEqual(second.get("key"), {"posts": [1, 2]})
+
+    def test_invalidation_propagates_by_stamp(self):
+        """Процесс сразу видит запись и удаление соседа."""
+        first = self.worker()
+        second = self.worker(1)
+        first.set("key", "old")
+        self.assertEqual(first.get("key"), "old")
+        second.set("key", "new")
+        self.assertEqual(first.get("key"), "new")
+        second.delete("key")
+        self.assertIsNone(first.get("key"))
+
+    def test_unchanged_value_revalidated_by_stamp_only(self):
+        worker = self.worker()
+        worker.set("key", "value")
+        shared = caches["shared"]
+        with mock.patch.object(shared, "get", wraps=shared.get) as get:
+            self.assertEqual(worker.get("key"), "value")
+        get.assert_called_once_with(worker.stamp_key(worker.make_key("key")))
+
+    def test_add_and_timeout(self):
+        worker = self.worker()
+        self.assertTrue(worker.add("key", 1))
+        self.assertFalse(self.worker(1).add("key", 2))
+        self.assertEqual(worker.get("key"), 1)
+        worker.set("gone", 1, timeout=0)
+        self.assertIsNone(worker.get("gone"))
+
+
+class CompressedLRUCacheTests(SimpleTestCase):
+    def make_cache(self, **options):
+        options.setdefault("COMPRESS_MIN_SIZE", 100)
+        cache = CompressedLRUCache(
+            f"lru-tests-{self.id()}", {"OPTIONS": options})
+        cache.clear()
+        return cache
+
+    def test_large_values_stored_compressed(self):
+        cache = self.make_cache()
+        page = "<p>Пост</p>" * 1000
+        cache.set("page", page)
+        cache.set("small", "x")
+        self.assertEqual(cache.get("page"), page)
+        self.assertEqual(cache.get("small"), "x")
+        stats = cache.stats()
+        self.assertLess(stats["bytes"], stats["raw_bytes"] / 10)
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        cache = self.make_cache(MAX_BYTES=250, COMPRESS_MIN_SIZE=10 ** 6)
+        for key in "abc":
+            cache.set(key, key * 60)
+        cache.get("a")
+        cache.set("d", "d" * 60)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "a" * 60)
+        stats = cache.stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertLessEqual(stats["bytes"], 250)
+
+    def test_value_over_budget_not_stored(self):
+        cache = self.make_cache(MAX_BYTES=50, COMPRESS_MIN_SIZE=10 ** 6)
+        cache.set("big", "x" * 100)
+        self.assertFalse(cache.has_key("big"))
+        self.assertEqual(cache.stats()["bytes"], 0)
+
+    def test_stats_and_expiry(self):
+        cache = self.make_cache()
+        cache.set("key", 1)
+        cache.set("gone", 1, timeout=0)
+        self.assertTrue(cache.add("new", 2))
+        self.assertFalse(cache.add("new", 3))
+        self.assertEqual(cache.get("key"), 1)
+        self.assertIsNone(cache.get("gone"))
+        self.assertIsNone(cache.get("missing"))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+        self.assertEqual(stats["entries"], 2)
+        cache.delete("key")
+        cache.delete("new")
+        self.assertEqual(cache.stats()["bytes"], 0)
+
+    def test_concurrent_add_has_one_winner(self):
+        """Из одновременных add одного ключа успешен ровно один."""
+        cache = self.make_cache()
+        pack = cache._pack
+
+        def slow_pack(value):
+            time.sleep(0.01)
+            return pack(value)
+
+        results = []
+        barrier = threading.Barrier(8)
+
+        def add(number):
+            barrier.wait()
+            results.append((cache.add("lock", number), number))
+
+        with mock.patch.object(cache, "_pack", slow_pack):
+            threads = [threading.Thread(target=add, args=(number,))
+                       for number in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        winners = [number for added, number in results if added]
+        self.assertEqual(len(winners), 1)
+        self.assertEqual(cache.get("lock"), winners[0])
+
+
+class TestCacheLocationTests(SimpleTestCase):
+    def test_file_caches_outside_app_cache(self):
+        """clear() в тестах не стирает файловый кеш и блокировки
+        запущенного приложения: TestRunner переносит их во временный
+        каталог.
+        """
+        app_cache = os.path.join(settings.BASE_DIR, "cache")
+        for alias, options in settings.CACHES.items():
+            if options["BACKEND"].endswith("FileBasedCache"):
+                with self.subTest(alias=alias):
+                    self.assertFalse(os.path.abspath(
+                        options["LOCATION"]).startswith(app_cache))
+        self.assertFalse(os.path.abspath(
+            settings.STALE_LOCK_DIR).startswith(app_cache))
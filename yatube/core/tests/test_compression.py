@@ -0,0 +1,73 @@
+import gzip
+
+from core.compression import choose_encoding, compress_response, minify_html
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+
+@override_settings(COMPRESS_MIN_SIZE=100, MINIFY_HTML=False)
+class CompressionTests(SimpleTestCase):
+    def request(self, encoding="gzip"):
+        return RequestFactory().get("/", HTTP_ACCEPT_ENCODING=encoding)
+
+    def test_minify_html_keeps_preformatted_blocks(self):
+        html = (b"<ul>\n    <li>  a  </li>\n\n    <li>b</li>\n</ul>\n"
+                b"<textarea>\n  text\n\n</textarea>  <pre> x\n\n y</pre>")
+        self.assertEqual(
+            minify_html(html),
+            b"<ul>\n<li> a </li>\n<li>b</li>\n</ul>\n"
+            b"<textarea>\n  text\n\n</textarea> <pre> x\n\n y</pre>"
+        )
+
+    def test_compresses_above_threshold(self):
+        content = b"<p>yatube</p>" * 100
+        response = HttpResponse(content)
+        response["ETag"] = '"abc"'
+        response = compress_response(self.request(), response)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response["ETag"], 'W/"abc"')
+        self.assertEqual(gzip.decompress(response.content), content)
+
+    def test_small_and_unaccepted_not_compressed(self):
+        cases = {
+            "small": (HttpResponse(b"<p>short</p>"), "gzip"),
+            "identity": (HttpResponse(b"<p>long</p>" * 100), "identity"),
+            "image": (HttpResponse(b"\x89PNG" * 100,
+                                   content_type="image/png"), "gzip"),
+        }
+        for name, (response, encoding) in cases.items():
+            with self.subTest(name=name):
+                response = compress_response(self.request(encoding), response)
+                self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_choose_encoding_honours_q_values(self):
+        for header, encoding in (
+                ("gzip;q=0.0", None),
+                ("gzip;q=0.000, br;q=0", None),
+                ("*;q=0", None),
+                ("br;q=0.5, gzip", "gzip"),
+                ("*;q=0.3, br;q=0", "gzip")):
+            with self.subTest(header=header):
+                self.assertEqual(
+                    choose_encoding(self.request(header)), encoding)
+
+    def test_streaming_response(self):
+        chunks = [b'{"id": %d}\n' % number for number in range(1000)]
+        response = compress_response(
+            self.request(),
+            StreamingHttpResponse(
+                iter(chunks), content_type="application/x-ndjson")
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(
+            gzip.decompress(b"".join(response.streaming_content)),
+            b"".join(chunks)
+        )
+
+    @override_settings(MINIFY_HTML=True)
+    def test_minifies_html(self):
+        response = compress_response(
+            self.request("identity"), HttpResponse(b"<p>\n\n   a</p>"))
+        self.assertEqual(response.content, b"<p>\na</p>")
+        self.assertEqual(response["Content-Length"], "9")
@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(SERVER_TIMING=True)
+class ServerTimingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(username="auth")
+        Post.objects.create(author=cls.auth, text="Тестовый пост")
+
+    def test_server_timing_header_and_log(self):
+        """Ответ содержит Server-Timing, а лог — имя представления."""
+        with self.assertLogs("yatube.timing", level="INFO") as logs:
+            response = Client().get(f"/profile/{self.auth.username}/")
+        timings = {
+            part.split(";")[0].strip()
+            for part in response["Server-Timing"].split(",")
+        }
+        self.assertEqual(timings, {"db", "tpl", "cache", "thumb", "total"})
+        self.assertIn('"view": "posts:profile"', logs.output[0])
+        self.assertEqual(logs.records[0].view_name, "posts:profile")
+        self.assertGreater(logs.records[0].metrics["db_queries"], 0)
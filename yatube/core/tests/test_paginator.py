@@ -0,0 +1,26 @@
+from core.paginator import ELLIPSIS, elided_page_range
+from django.core.paginator import Paginator
+from django.test import SimpleTestCase
+
+
+class ElidedPageRangeTests(SimpleTestCase):
+    def test_elided_page_range(self):
+        """Навигация не растёт с числом страниц."""
+        paginator = Paginator(range(100000), 10)
+        cases = {
+            1: [1, 2, 3, 4, ELLIPSIS, 9999, 10000],
+            500: [1, 2, ELLIPSIS, 497, 498, 499, 500, 501, 502, 503,
+                  ELLIPSIS, 9999, 10000],
+            10000: [1, 2, ELLIPSIS, 9997, 9998, 9999, 10000],
+        }
+        for number, expected in cases.items():
+            with self.subTest(number=number):
+                self.assertEqual(
+                    list(elided_page_range(paginator.page(number))),
+                    expected
+                )
+
+    def test_few_pages_not_elided(self):
+        paginator = Paginator(range(50), 10)
+        self.assertEqual(
+            list(elided_page_range(paginator.page(3))), [1, 2, 3, 4, 5])
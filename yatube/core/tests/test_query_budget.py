@@ -0,0 +1,106 @@
+from types import SimpleNamespace
+
+from core.middleware import NPlusOneMiddleware
+from core.query_budget import (QueryBudgetExceeded, QueryLog,
+                               allow_repeated_queries, max_queries,
+                               query_budget, query_shape)
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(QUERY_BUDGETS="raise", N_PLUS_ONE_THRESHOLD=3)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(username="auth")
+        for number in range(3):
+            Post.objects.create(author=cls.auth, text=f"Пост {number}")
+
+    def test_query_shape_ignores_in_list_length(self):
+        self.assertEqual(
+            query_shape('SELECT 1 WHERE "id" IN (%s, %s, %s)'),
+            query_shape('SELECT 1 WHERE "id" IN (%s, %s)')
+        )
+
+    def test_max_queries(self):
+        with max_queries(1):
+            list(Post.objects.all())
+        with self.assertRaises(QueryBudgetExceeded):
+            with max_queries(1):
+                list(Post.objects.all())
+                Post.objects.count()
+
+    def test_warn_logs_instead_of_raising(self):
+        """В режиме warn, по умолчанию при DEBUG, превышение только
+        пишется в лог.
+        """
+        with override_settings(QUERY_BUDGETS="warn"), self.assertLogs(
+                "yatube.queries", "WARNING") as logs:
+            with max_queries(0, "Лента"):
+                Post.objects.count()
+        self.assertIn("Лента: 1 SQL-запросов", logs.output[0])
+
+    def test_query_budget_decorator(self):
+        @query_budget(1)
+        def view(request):
+            return HttpResponse(Post.objects.count())
+
+        request = RequestFactory().get("/")
+        self.assertEqual(view.query_budget, 1)
+        view(request)
+        with override_settings(QUERY_BUDGETS="off"):
+            query_budget(0)(view)(request)
+        with self.assertRaises(QueryBudgetExceeded):
+            query_budget(0)(view)(request)
+
+    def test_budget_counts_shapes_of_repeated_queries(self):
+        """С allow_repeated_queries бюджет считает формы запросов."""
+        @query_budget(2)
+        @allow_repeated_queries
+        def view(request):
+            for post in Post.objects.all():
+                Post.objects.filter(pk=post.pk).exists()
+            return HttpResponse()
+
+        view(RequestFactory().get("/"))
+        self.assertTrue(view.allow_repeated_queries)
+
+        @query_budget(2)
+        @allow_repeated_queries
+        def three_shapes(request):
+            Post.objects.count()
+            Post.objects.exists()
+            list(Post.objects.all())
+            return HttpResponse()
+
+        with self.assertRaises(QueryBudgetExceeded):
+            three_shapes(RequestFactory().get("/"))
+
+    def test_n_plus_one_detected(self):
+        def view(request):
+            authors = [post.author for post in Post.objects.all()]
+            return HttpResponse(len(authors))
+
+        def view_with_join(request):
+            posts = Post.objects.select_related("author")
+            return HttpResponse(len([post.author for post in posts]))
+
+        request = RequestFactory().get("/")
+        NPlusOneMiddleware(view_with_join)(request)
+        with self.assertRaisesMessage(QueryBudgetExceeded, "3 x SELECT"):
+            NPlusOneMiddleware(view)(request)
+
+    @override_settings(DATABASE_SHARDS=["shard-a", "shard-b"])
+    def test_scatter_query_counted_once(self):
+        """Запрос ко всем шардам считается одним, повторы на шарде — нет."""
+        query_log = QueryLog()
+        for alias in ("shard-a", "shard-b", "shard-a", "default"):
+            context = {"connection": SimpleNamespace(alias=alias)}
+            query_log(lambda *args: None, "SELECT 1", (), False, context)
+        self.assertEqual(len(query_log), 3)
+        self.assertEqual(query_log.repeated_shapes(3), {"SELECT 1": 3})
@@ -0,0 +1,119 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from core.replicas import (PINNED_COOKIE, ReplicaPinMiddleware,
+                           ReplicaRouter, read_replica)
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from posts.models import Post
+
+
+router = ReplicaRouter()
+
+
+@read_replica
+def view(request):
+    return router.db_for_read(Post), router.db_for_read(Session)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRouterTests(SimpleTestCase):
+    def test_feed_reads_go_to_replica(self):
+        request = RequestFactory().get("/")
+        self.assertEqual(view(request), ("replica", "default"))
+        self.assertEqual(router.db_for_read(Post), "default")
+        self.assertEqual(router.db_for_write(Post), "default")
+
+    def test_writes_pin_client_to_primary(self):
+        def writes(*models):
+            def get_response(request):
+                for model in models:
+                    router.db_for_write(model)
+                return HttpResponse()
+            return ReplicaPinMiddleware(get_response)
+
+        request = RequestFactory().post("/")
+        self.assertNotIn(
+            PINNED_COOKIE, writes(Session)(request).cookies)
+        response = writes(Session, Post)(request)
+        pinned = response.cookies[PINNED_COOKIE]
+        self.assertGreater(float(pinned.value), time.time())
+
+        request = RequestFactory().get("/")
+        request.COOKIES[PINNED_COOKIE] = pinned.value
+        self.assertEqual(view(request), ("default", "default"))
+        self.assertEqual(
+            view(RequestFactory().post("/")), ("default", "default"))
+
+
+class SyncReplicasTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_replica_gets_snapshot_of_primary(self):
+        primary = os.path.join(self.directory, "primary.sqlite3")
+        replica = os.path.join(self.directory, "replica.sqlite3")
+        with sqlite3.connect(primary) as connection:
+            connection.execute("CREATE TABLE post (text TEXT)")
+            connection.execute("INSERT INTO post VALUES ('Пост')")
+        databases = {
+            "default": {"ENGINE": "django.db.backends.sqlite3",
+                        "NAME": primary},
+            "replica": {"ENGINE": "django.db.backends.sqlite3",
+                        "NAME": replica},
+        }
+        with override_settings(
+                DATABASES=databases, DATABASE_REPLICAS=["replica"]):
+            call_command("sync_replicas", stdout=StringIO())
+        with sqlite3.connect(replica) as connection:
+            rows = connection.execute("SELECT text FROM post").fetchall()
+        self.assertEqual(rows, [("Пост",)])
+
+    def test_interval_retries_after_sqlite_error(self):
+        """С --interval ошибка SQLite пишется в stderr, и копирование
+        повторяется.
+        """
+        primary = os.path.join(self.directory, "primary.sqlite3")
+        replica_dir = os.path.join(self.directory, "replicas")
+        replica = os.path.join(replica_dir, "replica.sqlite3")
+        sqlite3.connect(primary).close()
+        databases = {
+            "default": {"ENGINE": "django.db.backends.sqlite3",
+                        "NAME": primary},
+            "replica": {"ENGINE": "django.db.backends.sqlite3",
+                        "NAME": replica},
+        }
+
+        class Stop(Exception):
+            pass
+
+        sleeps = []
+
+        def sleep(seconds):
+            # Каталог реплики появляется после первой неудачи.
+            os.makedirs(replica_dir, exist_ok=True)
+            sleeps.append(seconds)
+            if len(sleeps) == 2:
+                raise Stop
+
+        stdout, stderr = StringIO(), StringIO()
+        with override_settings(
+                DATABASES=databases, DATABASE_REPLICAS=["replica"]):
+            with self.assertRaises(CommandError):
+                call_command("sync_replicas", stdout=StringIO())
+            with mock.patch(
+                    "core.management.commands.sync_replicas.time.sleep",
+                    sleep), self.assertRaises(Stop):
+                call_command("sync_replicas", "--interval", "5",
+                             stdout=stdout, stderr=stderr)
+        self.assertIn("Копирование не удалось", stderr.getvalue())
+        self.assertIn("replica: скопировано", stdout.getvalue())
@@ -0,0 +1,83 @@
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from core.sessions import SessionStore
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+
+class WriteBehindSessionTests(TestCase):
+    def setUp(self):
+        caches["sessions"].clear()
+
+    def stored(self, session):
+        return Session.objects.get(pk=session.session_key).get_decoded()
+
+    def test_changes_reach_db_once_per_interval(self):
+        session = SessionStore()
+        session["step"] = 1
+        session.save()
+        self.assertEqual(self.stored(session), {"step": 1})
+
+        session["step"] = 2
+        session.save()
+        session["step"] = 3
+        session.save()
+        self.assertEqual(self.stored(session), {"step": 2})
+        self.assertEqual(SessionStore(session.session_key)["step"], 3)
+
+        caches["sessions"].delete(session.synced_key)
+        session["step"] = 4
+        session.save()
+        self.assertEqual(self.stored(session), {"step": 4})
+
+    def test_login_written_through(self):
+        """Смена пользователя сессии попадает в БД сразу."""
+        session = SessionStore()
+        session["step"] = 1
+        session.save()
+        session["step"] = 2
+        session.save()
+        session[SESSION_KEY] = "1"
+        session.save()
+        self.assertEqual(self.stored(session)[SESSION_KEY], "1")
+        session.flush()
+        self.assertFalse(Session.objects.exists())
+
+    def test_purge_sessions_in_batches(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            Session(session_key=f"expired{number}", session_data="",
+                    expire_date=now - timedelta(days=1))
+            for number in range(5)
+        )
+        Session.objects.create(
+            session_key="alive", session_data="",
+            expire_date=now + timedelta(days=1))
+        cache = caches["sessions"]
+        for session_key in ("expired0", "alive"):
+            for key in SessionStore.cache_keys(session_key):
+                cache.set(key, {})
+        cache.set("synced-long-ago", [], 60)
+        out = StringIO()
+        later = time.time() + 120
+        with mock.patch(
+                "django.core.cache.backends.filebased.time.time",
+                return_value=later):
+            call_command("purge_sessions", batch_size=2, stdout=out)
+        self.assertIn("Удалено сессий: 5", out.getvalue())
+        self.assertIn("Удалено истёкших записей кеша: 1", out.getvalue())
+        self.assertQuerysetEqual(
+            Session.objects.all(), ["alive"], lambda session: session.pk)
+        self.assertEqual(
+            [cache.has_key(key) for key in SessionStore.cache_keys("alive")],
+            [True, True])
+        self.assertFalse(any(cache.has_key(key)
+                             for key in SessionStore.cache_keys("expired0")))
+        self.assertFalse(cache.has_key("synced-long-ago"))
@@ -0,0 +1,39 @@
+import os
+import tempfile
+
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+
+
+class ApplyPragmasTests(SimpleTestCase):
+    def connect(self):
+        directory = tempfile.mkdtemp()
+        wrapper = DatabaseWrapper({
+            "NAME": os.path.join(directory, "test.sqlite3"),
+            "ENGINE": "django.db.backends.sqlite3",
+            "OPTIONS": {}, "TIME_ZONE": None, "CONN_MAX_AGE": 0,
+            "AUTOCOMMIT": True, "ATOMIC_REQUESTS": False,
+        }, alias="pragmas")
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        return wrapper.connection.execute(f"PRAGMA {name}").fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS={
+        "journal_mode": "WAL", "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+    })
+    def test_new_connection_gets_pragmas(self):
+        """Новое соединение SQLite получает PRAGMA из SQLITE_PRAGMAS."""
+        wrapper = self.connect()
+        self.assertEqual(self.pragma(wrapper, "journal_mode"), "wal")
+        self.assertEqual(self.pragma(wrapper, "synchronous"), 1)
+        self.assertEqual(self.pragma(wrapper, "busy_timeout"), 5000)
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_defaults_without_pragmas(self):
+        """Без SQLITE_PRAGMAS SQLite работает с журналом по умолчанию."""
+        wrapper = self.connect()
+        self.assertEqual(self.pragma(wrapper, "journal_mode"), "delete")
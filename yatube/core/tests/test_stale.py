@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from unittest import mock
+
+from core.stale import acquire_lock, get_or_refresh, stale_while_revalidate
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotFound
+from django.test import RequestFactory, SimpleTestCase
+from django.views.decorators.http import condition
+
+
+# Кеш и каталог блокировок из settings (у TestRunner — временные):
+# атомарность блокировки проверяется на них, а не на LocMemCache.
+class StaleWhileRevalidateTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+
+    def build(self):
+        self.builds += 1
+        return self.builds
+
+    def test_fresh_value_built_once(self):
+        self.assertEqual(get_or_refresh("key", self.build, 20), 1)
+        self.assertEqual(get_or_refresh("key", self.build, 20), 1)
+
+    def test_jitter_shortens_freshness(self):
+        with mock.patch("core.stale.random.random", return_value=1):
+            get_or_refresh("key", self.build, 100, jitter=0.1)
+        _, fresh_until = cache.get("key")
+        self.assertAlmostEqual(fresh_until - time.time(), 90, delta=1)
+
+    def test_stale_value_served_while_refreshing(self):
+        get_or_refresh("key", self.build, 20)
+        later = time.time() + 30
+        lock = acquire_lock("default:key")
+        os.utime(lock, (later, later))
+        with mock.patch("core.stale.time.time", return_value=later):
+            self.assertEqual(get_or_refresh("key", self.build, 20), 1)
+            os.remove(lock)
+            self.assertEqual(get_or_refresh("key", self.build, 20), 2)
+        self.assertEqual(self.builds, 2)
+
+    def test_abandoned_lock_taken_over(self):
+        lock = acquire_lock("default:key")
+        self.assertIsNone(acquire_lock("default:key"))
+        past = time.time() - 60
+        os.utime(lock, (past, past))
+        self.assertEqual(acquire_lock("default:key"), lock)
+        os.remove(lock)
+
+    def test_concurrent_miss_builds_once(self):
+        """Одновременный промах стоит одной пересборки."""
+        def slow_build():
+            time.sleep(0.2)
+            return self.build()
+
+        for _ in range(5):
+            cache.clear()
+            self.builds = 0
+            results = []
+            threads = [
+                threading.Thread(target=lambda: results.append(
+                    get_or_refresh("key", slow_build, 20)))
+                for _ in range(20)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(results, [1] * 20)
+            self.assertEqual(self.builds, 1)
+
+    def test_view_decorator(self):
+        @stale_while_revalidate(
+            20, key_prefix="test", vary=("Accept-Encoding",))
+        def view(request):
+            if request.GET.get("missing"):
+                return HttpResponseNotFound()
+            return HttpResponse(str(self.build()))
+
+        factory = RequestFactory()
+        self.assertEqual(view(factory.get("/")).content, b"1")
+        self.assertEqual(view(factory.get("/")).content, b"1")
+        self.assertEqual(view(factory.get("/", HTTP_ACCEPT_ENCODING="gzip"))
+                         .content, b"2")
+        self.assertEqual(view(factory.get("/")).get("Cache-Control"),
+                         "max-age=20")
+        view(factory.get("/", {"missing": 1}))
+        self.assertEqual(
+            view(factory.get("/", {"missing": 1})).status_code, 404)
+        self.assertEqual(view(factory.post("/")).content, b"3")
+
+    def test_conditional_get_uses_cached_etag(self):
+        """304 и ETag берутся из закешированной страницы, а состояние
+        считается только при пересборке.
+        """
+        @stale_while_revalidate(20, key_prefix="test")
+        @condition(etag_func=lambda request: str(self.build()))
+        def view(request):
+            return HttpResponse("page")
+
+        factory = RequestFactory()
+        etag = view(factory.get("/"))["ETag"]
+        response = view(factory.get("/", HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(view(factory.get("/"))["ETag"], etag)
+        self.assertEqual(self.builds, 1)
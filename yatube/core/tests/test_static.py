@@ -0,0 +1,76 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from core.static import IMMUTABLE_CACHE_CONTROL, serve
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+TEMP_STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    STATIC_ROOT=TEMP_STATIC_ROOT,
+    STATICFILES_STORAGE="core.storage.CompressedManifestStaticFilesStorage"
+)
+class StaticPipelineTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_STATIC_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.css = staticfiles_storage.stored_name("css/bootstrap.min.css")
+
+    def get(self, path, **headers):
+        return serve(RequestFactory().get("/", **headers), path)
+
+    def test_collectstatic_hashes_and_compresses(self):
+        """collectstatic пишет имена с хешем и сжатые копии текста."""
+        self.assertNotEqual(self.css, "css/bootstrap.min.css")
+        path = os.path.join(TEMP_STATIC_ROOT, self.css)
+        self.assertTrue(os.path.isfile(path + ".gz"))
+        with open(path, "rb") as original, gzip.open(path + ".gz") as packed:
+            self.assertEqual(packed.read(), original.read())
+        logo = staticfiles_storage.stored_name("img/logo.png")
+        self.assertFalse(
+            os.path.exists(os.path.join(TEMP_STATIC_ROOT, logo + ".gz")))
+
+    def test_serve_picks_encoding(self):
+        """Сжатая копия выбирается по Accept-Encoding."""
+        response = self.get(self.css, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response["Cache-Control"], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(
+            gzip.decompress(b"".join(response.streaming_content)),
+            b"".join(self.get(self.css).streaming_content)
+        )
+        self.assertFalse(self.get(self.css).has_header("Content-Encoding"))
+
+    def test_serve_honours_q_values(self):
+        """q=0 запрещает кодировку, из разрешённых берётся с большим q."""
+        for header, encoding in (
+                ("gzip;q=0", None),
+                ("gzip; q=0.0, br;q=0", None),
+                ("br;q=0, gzip;q=0.5", "gzip"),
+                ("*;q=0.1, br;q=0", "gzip")):
+            with self.subTest(header=header):
+                response = self.get(self.css, HTTP_ACCEPT_ENCODING=header)
+                self.assertEqual(response.get("Content-Encoding"), encoding)
+                self.assertEqual(response["Content-Type"], "text/css")
+                self.assertNotIn(
+                    ".gz", response.get("Content-Disposition", ""))
+
+    def test_unhashed_name_is_not_immutable(self):
+        response = self.get("css/bootstrap.min.css")
+        self.assertFalse(response.has_header("Cache-Control"))
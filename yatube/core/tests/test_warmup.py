@@ -0,0 +1,23 @@
+from core.warmup import warm_templates
+from django.conf import settings
+from django.template import engines
+from django.test import SimpleTestCase, override_settings
+
+CACHED_TEMPLATES = [dict(
+    settings.TEMPLATES[0],
+    OPTIONS=dict(settings.TEMPLATES[0]["OPTIONS"], loaders=[(
+        "django.template.loaders.cached.Loader",
+        ["django.template.loaders.filesystem.Loader"],
+    )])
+)]
+
+
+@override_settings(TEMPLATES=CACHED_TEMPLATES)
+class WarmTemplatesTests(SimpleTestCase):
+    def test_templates_compiled_into_cache(self):
+        """Все шаблоны из DIRS оказываются в кешированном загрузчике."""
+        compiled = warm_templates()
+        self.assertIn("posts/index.html", compiled)
+        self.assertIn("includes/paginator.html", compiled)
+        loader = engines["django"].engine.template_loaders[0]
+        self.assertTrue(set(compiled) <= set(loader.get_template_cache))
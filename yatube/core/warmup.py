@@ -0,0 +1,28 @@
+import os
+
+from django.template import engines
+
+
+def template_names(directory):
+    """Имена всех шаблонов каталога относительно него."""
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            if filename.endswith(".html"):
+                path = os.path.relpath(os.path.join(root, filename), directory)
+                yield path.replace(os.sep, "/")
+
+
+def warm_templates():
+    """Компилирует шаблоны из DIRS всех движков.
+
+    С кешированным загрузчиком скомпилированные шаблоны остаются в
+    памяти процесса, и первый запрос воркера не разбирает их заново.
+    Возвращает имена скомпилированных шаблонов.
+    """
+    compiled = []
+    for engine in engines.all():
+        for directory in engine.dirs:
+            for name in template_names(directory):
+                engine.get_template(name)
+                compiled.append(name)
+    return compiled
@@ -0,0 +1,445 @@
+import math
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter, namedtuple
+from contextlib import ExitStack
+
+from core.sqlite import pragma_statements
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection, connections, transaction
+from django.db.models import Count
+from django.template.backends.django import DjangoTemplates
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, Post, User
+
+Scenario = namedtuple("Scenario", "name method url data user write")
+
+# Доля увеличения p50, после которой замер считается регрессией.
+DEFAULT_TOLERANCE = 0.2
+TEMPLATE_LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+# Значения SQLite по умолчанию для профиля "default": копия базы в WAL
+# иначе так и осталась бы в WAL.
+SQLITE_BASELINE_PRAGMAS = {
+    "journal_mode": "DELETE",
+    "synchronous": "FULL",
+    "mmap_size": 0,
+    "cache_size": -2000,
+    "temp_store": "DEFAULT",
+}
+
+
+def last_page(count):
+    return max(1, math.ceil(count / settings.COUNT_POSTS))
+
+
+def top(queryset, field):
+    """Значение field с наибольшим числом строк в queryset."""
+    row = queryset.values(field).annotate(
+        rows=Count("pk")).order_by("-rows").first()
+    return (row[field], row["rows"]) if row else (None, 0)
+
+
+def paginated(name, route, kwargs, count, user=None):
+    url = reverse(route, kwargs=kwargs)
+    return [
+        Scenario(f"{name}[shallow]", "get", url, {"page": 1}, user, False),
+        Scenario(f"{name}[deep]", "get", url,
+                 {"page": last_page(count)}, user, False),
+    ]
+
+
+def build_scenarios():
+    """Сценарии для каждого именованного маршрута posts/urls.py.
+
+    Берутся самые «тяжёлые» объекты базы: автор и группа с наибольшим
+    числом постов, пост с наибольшим числом комментариев, читатель с
+    наибольшим числом подписок.
+    """
+    author_id, author_posts = top(Post.objects.all(), "author")
+    group_id, group_posts = top(Post.objects.exclude(group=None), "group")
+    reader_id, _ = top(Follow.objects.all(), "user")
+    post_id, _ = top(Comment.objects.all(), "post")
+    if author_id is None:
+        return []
+    author = User.objects.get(pk=author_id)
+    reader = User.objects.get(pk=reader_id) if reader_id else author
+    newest = Post.objects.values_list("pk", flat=True).first()
+    scenarios = paginated(
+        "posts:index", "posts:index", {}, Post.objects.count())
+    scenarios += paginated(
+        "posts:profile", "posts:profile",
+        {"username": author.username}, author_posts)
+    if group_id:
+        scenarios += paginated(
+            "posts:group_list", "posts:group_list",
+            {"slug": Group.objects.get(pk=group_id).slug}, group_posts)
+    scenarios += paginated(
+        "posts:follow_index", "posts:follow_index", {},
+        Post.objects.filter(author__following__user=reader).count(), reader)
+    for label, pk in (("shallow", newest), ("deep", post_id or newest)):
+        scenarios.append(Scenario(
+            f"posts:post_detail[{label}]", "get",
+            reverse("posts:post_detail", kwargs={"post_id": pk}),
+            {}, None, False))
+    create_url = reverse("posts:post_create")
+    follow_kwargs = {"username": author.username}
+    scenarios += [
+        Scenario("posts:post_create[form]", "get", create_url,
+                 {}, author, False),
+        Scenario("posts:post_create[submit]", "post", create_url,
+                 {"text": "Замер"}, author, True),
+        Scenario("posts:add_comment", "post",
+                 reverse("posts:add_comment", kwargs={"post_id": newest}),
+                 {"text": "Замер"}, reader, True),
+        Scenario("posts:profile_follow", "get",
+                 reverse("posts:profile_follow", kwargs=follow_kwargs),
+                 {}, reader, True),
+        Scenario("posts:profile_unfollow", "get",
+                 reverse("posts:profile_unfollow", kwargs=follow_kwargs),
+                 {}, reader, True),
+    ]
+    return scenarios
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, math.ceil(share * len(ordered)) - 1)
+    return ordered[max(index, 0)]
+
+
+def writable_aliases():
+    """Базы, куда пишут представления: основная, шарды и архив."""
+    aliases = ["default", *settings.DATABASE_SHARDS]
+    if settings.ARCHIVE_DATABASE is not None:
+        aliases.append(settings.ARCHIVE_DATABASE)
+    return aliases
+
+
+def measure(client, scenario, cold_cache=False):
+    """Один запрос: время, число и время SQL-запросов во всех базах
+    проекта, размер ответа.
+    """
+    if cold_cache:
+        cache.clear()
+    writable = writable_aliases()
+    with ExitStack() as stack:
+        captured = {
+            alias: stack.enter_context(
+                CaptureQueriesContext(connections[alias]))
+            for alias in writable + settings.DATABASE_REPLICAS
+        }
+        started = time.perf_counter()
+        with ExitStack() as atomic:
+            for alias in writable:
+                atomic.enter_context(transaction.atomic(using=alias))
+            response = getattr(client, scenario.method)(
+                scenario.url, scenario.data)
+            body = (b"".join(response.streaming_content)
+                    if response.streaming else response.content)
+            # Пишущие сценарии не должны менять засеянные базы.
+            for alias in writable:
+                transaction.set_rollback(scenario.write, using=alias)
+        elapsed = time.perf_counter() - started
+    queries = {alias: list(context) for alias, context in captured.items()}
+    return {
+        "time": elapsed,
+        "queries": sum(len(logged) for logged in queries.values()),
+        "queries_by_db": {
+            alias: len(logged) for alias, logged in queries.items()
+            if logged
+        },
+        "sql_time": sum(float(query["time"])
+                        for logged in queries.values() for query in logged),
+        "size": len(body),
+        "status": response.status_code,
+    }
+
+
+def summarize(samples):
+    times = [sample["time"] * 1000 for sample in samples]
+    return {
+        "p50_ms": percentile(times, 0.5),
+        "p90_ms": percentile(times, 0.9),
+        "p99_ms": percentile(times, 0.99),
+        "mean_ms": statistics.mean(times),
+        "max_ms": max(times),
+        "queries": max(sample["queries"] for sample in samples),
+        "queries_by_db": max(
+            (sample["queries_by_db"] for sample in samples),
+            key=lambda counts: sum(counts.values())),
+        "sql_ms": statistics.mean(
+            sample["sql_time"] * 1000 for sample in samples),
+        "size": max(sample["size"] for sample in samples),
+        "status": samples[-1]["status"],
+    }
+
+
+def cache_mode(cold_cache):
+    return "cold" if cold_cache else "warm"
+
+
+def run(scenarios, repeat, warmup=1, cold_cache=False):
+    """Замеры сценариев: с cold_cache кеш очищается перед каждым
+    запросом, иначе замеры идут по кешу, прогретому warmup запросами.
+    """
+    results = {}
+    for scenario in scenarios:
+        client = Client()
+        if scenario.user:
+            client.force_login(scenario.user)
+        for _ in range(warmup):
+            measure(client, scenario, cold_cache)
+        results[scenario.name] = summarize([
+            measure(client, scenario, cold_cache) for _ in range(repeat)
+        ])
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Регрессии относительно baseline: рост p50 больше tolerance
+    или любое увеличение числа SQL-запросов.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current["queries"] > previous["queries"]:
+            regressions.append(
+                f"{name}: запросов {previous['queries']} -> "
+                f"{current['queries']}")
+        if current["p50_ms"] > previous["p50_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p50 {previous['p50_ms']:.1f} -> "
+                f"{current['p50_ms']:.1f} мс")
+    return regressions
+
+
+def template_engine(cached):
+    """Движок с настройками проекта, с кешированным загрузчиком или без."""
+    loaders = TEMPLATE_LOADERS
+    if cached:
+        loaders = [("django.template.loaders.cached.Loader", loaders)]
+    options = dict(settings.TEMPLATES[0]["OPTIONS"], loaders=loaders)
+    return DjangoTemplates({
+        "NAME": "bench",
+        "DIRS": settings.TEMPLATES[0]["DIRS"],
+        "APP_DIRS": False,
+        "OPTIONS": options,
+    })
+
+
+def jinja2_engine():
+    """Движок Jinja2 из настроек без проверки изменений файлов, как в
+    продакшене, или None, если он не настроен.
+    """
+    params = next((
+        params for params in settings.TEMPLATES
+        if params.get("NAME") == "jinja2"
+    ), None)
+    if params is None:
+        return None
+    from django.template.backends.jinja2 import Jinja2
+    return Jinja2({
+        "NAME": "bench_jinja2",
+        "DIRS": params["DIRS"],
+        "APP_DIRS": False,
+        "OPTIONS": dict(params["OPTIONS"], auto_reload=False),
+    })
+
+
+def feed_contexts():
+    """Контексты страниц лент с уже загруженной первой страницей."""
+    posts = Post.objects.select_related("author", "group")
+    post = posts.exclude(group=None).first()
+    if post is None:
+        return {}
+    # Пять страниц в памяти: замеряется шаблон, а не SQL и пагинатор.
+    page = Paginator(
+        list(posts[:settings.COUNT_POSTS * 5]), settings.COUNT_POSTS
+    ).page(1)
+    return {
+        "posts/index.html": {"page_obj": page},
+        "posts/follow.html": {"page_obj": page},
+        "posts/group_list.html": {
+            "page_obj": page, "group": post.group, "subscribed": False},
+        "posts/profile.html": {
+            "page_obj": page, "author": post.author, "following": False},
+    }
+
+
+def run_templates(repeat):
+    """p50 рендеринга страниц лент без кеша шаблонов, с ним и в Jinja2."""
+    request = RequestFactory().get("/")
+    request.user = AnonymousUser()
+    engines = {"plain": template_engine(False),
+               "cached": template_engine(True),
+               "jinja2": jinja2_engine()}
+    results = {}
+    for name, context in feed_contexts().items():
+        results[name] = {}
+        for label, engine in engines.items():
+            if engine is None:
+                continue
+            times = []
+            for _ in range(repeat + 1):
+                started = time.perf_counter()
+                engine.get_template(name).render(dict(context), request)
+                times.append((time.perf_counter() - started) * 1000)
+            # Первый рендер разбирает шаблоны в обоих движках.
+            results[name][f"{label}_ms"] = percentile(times[1:], 0.5)
+    return results
+
+
+def copy_database(directory, name, pragmas):
+    """Копия основной SQLite-базы с профилем pragmas. Режим журнала
+    хранится в файле, backup переносит его из исходной базы, поэтому
+    профили нельзя сравнивать на одном файле и без явного journal_mode.
+    """
+    path = os.path.join(directory, f"{name}.sqlite3")
+    connection.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        connection.connection.backup(target)
+        for statement in pragma_statements(pragmas):
+            target.execute(statement)
+    finally:
+        target.close()
+    return path
+
+
+def feed_reads(group_ids):
+    """SQL страниц лент групп, как в group_posts, на случайной глубине;
+    без групп — страниц главной.
+    """
+    while True:
+        posts = Post.objects.select_related("author", "group")
+        if group_ids:
+            posts = posts.filter(group_id=random.choice(group_ids))
+        offset = random.randrange(50) * settings.COUNT_POSTS
+        sql, params = posts[
+            offset:offset + settings.COUNT_POSTS].query.sql_with_params()
+        # Обёртка курсора Django заменяет %s на ?, здесь курсор без неё.
+        yield sql.replace("%s", "?"), params
+
+
+def sqlite_workload(path, pragmas, readers, writers, seconds,
+                    read_paths=None):
+    """Читатели лент и писатели постов в отдельных потоках на одной базе
+    или, с read_paths, читатели по очереди на копиях из read_paths.
+
+    Соединения открываются как в Django: автокоммит и таймаут 5 с.
+    """
+    group_ids = list(Group.objects.values_list("pk", flat=True))
+    author_id = User.objects.values_list("pk", flat=True).first()
+    insert = (
+        f"INSERT INTO {Post._meta.db_table} "
+        "(text, created, updated, author_id, group_id, image) "
+        "VALUES (?, ?, ?, ?, ?, '')"
+    )
+    counts = Counter()
+    latencies = {"read": [], "write": []}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker(kind, path):
+        db = sqlite3.connect(path, isolation_level=None,
+                             check_same_thread=False)
+        for statement in pragma_statements(pragmas):
+            db.execute(statement)
+        reads = feed_reads(group_ids)
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                if kind == "read":
+                    db.execute(*next(reads)).fetchall()
+                else:
+                    now = timezone.now().isoformat(" ")
+                    group_id = random.choice(group_ids or [None])
+                    db.execute(
+                        insert, ("bench", now, now, author_id, group_id))
+            except sqlite3.OperationalError:
+                with lock:
+                    counts[f"{kind}_errors"] += 1
+                continue
+            with lock:
+                counts[kind] += 1
+                latencies[kind].append(
+                    (time.perf_counter() - started) * 1000)
+        db.close()
+
+    read_paths = read_paths or [path]
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=("read", read_paths[number % len(read_paths)]))
+        for number in range(readers)
+    ] + [
+        threading.Thread(target=worker, args=("write", path))
+        for number in range(writers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        "reads_per_s": counts["read"] / seconds,
+        "writes_per_s": counts["write"] / seconds,
+        "read_p99_ms": percentile(latencies["read"] or [0], 0.99),
+        "write_p99_ms": percentile(latencies["write"] or [0], 0.99),
+        "errors": counts["read_errors"] + counts["write_errors"],
+    }
+
+
+def run_sqlite(readers, writers, seconds):
+    """Пропускная способность чтения и записи на копиях базы с настройками
+    SQLite по умолчанию (SQLITE_BASELINE_PRAGMAS) и с
+    SQLITE_PRODUCTION_PRAGMAS.
+    """
+    profiles = {
+        "default": SQLITE_BASELINE_PRAGMAS,
+        "production": settings.SQLITE_PRODUCTION_PRAGMAS,
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, pragmas in profiles.items():
+            path = copy_database(directory, name, pragmas)
+            results[name] = sqlite_workload(
+                path, pragmas, readers, writers, seconds)
+    return results
+
+
+def run_replicas(readers, writers, seconds, replicas):
+    """Чтение лент при записи в основную базу: все потоки на одной копии
+    и читатели на replicas копиях-репликах. Обе схемы с
+    SQLITE_PRODUCTION_PRAGMAS; реплики во время замера не обновляются.
+    """
+    pragmas = settings.SQLITE_PRODUCTION_PRAGMAS
+    with tempfile.TemporaryDirectory() as directory:
+        path = copy_database(directory, "primary", pragmas)
+        read_paths = [
+            copy_database(directory, f"replica{number}", pragmas)
+            for number in range(1, replicas + 1)
+        ]
+        return {
+            "primary": sqlite_workload(
+                path, pragmas, readers, writers, seconds),
+            "replicas": sqlite_workload(
+                copy_database(directory, "primary-replicated", pragmas),
+                pragmas, readers, writers, seconds, read_paths),
+        }
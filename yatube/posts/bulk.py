@@ -0,0 +1,180 @@
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def preserve_timestamps(*models):
+    """Отключает auto_now/auto_now_add у моделей, чтобы bulk_create
+    сохранял даты из данных, а не текущее время.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False)
+        or getattr(field, "auto_now_add", False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def existing_keys(manager, fields, keys):
+    """Какие из ключей keys (кортежей значений fields) уже есть в базе."""
+    connection = connections[manager.db]
+    size = connection.features.max_query_params or len(keys) or 1
+    first = sorted({key[0] for key in keys})
+    found = set()
+    for start in range(0, len(first), size):
+        found.update(manager.filter(**{
+            f"{fields[0]}__in": first[start:start + size]
+        }).values_list(*fields))
+    return found & set(keys)
+
+
+class BatchWriter:
+    """Копит объекты и пишет их bulk_create пачками.
+
+    Модели сбрасываются в порядке models, чтобы ссылки внутри пачки
+    (комментарий на пост из той же пачки) были уже записаны. Каждая
+    пачка пишется в отдельной транзакции. Объекты, чей ключ (по
+    умолчанию pk, иначе поля из keys) уже есть в базе или повторяется
+    в пачке, пропускаются; их pk запоминаются, и объекты, ссылающиеся
+    на них или на несуществующие строки моделей из models, тоже
+    пропускаются. written и skipped считают строки по моделям.
+    """
+
+    def __init__(self, models, batch_size, on_flush=None, using=None,
+                 keys=None):
+        self.buffers = {model: [] for model in models}
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.using = using
+        self.keys = {model: ("pk",) for model in models}
+        self.keys.update(keys or {})
+        self.rejected = {model: set() for model in models}
+        self.pending = 0
+        self.written = Counter()
+        self.skipped = Counter()
+
+    def add(self, obj):
+        self.buffers[type(obj)].append(obj)
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def new_objects(self, model, objects):
+        """Объекты без уже занятых ключей и без висячих ссылок."""
+        fields = self.keys[model]
+        manager = model.objects.db_manager(self.using)
+        keys = [
+            tuple(getattr(obj, name) for name in fields) for obj in objects
+        ]
+        taken = existing_keys(
+            manager, fields, [key for key in keys if None not in key])
+        unique = []
+        for obj, key in zip(objects, keys):
+            if None in key:
+                unique.append(obj)
+            elif key in taken:
+                if fields == ("pk",):
+                    self.rejected[model].add(obj.pk)
+            else:
+                taken.add(key)
+                unique.append(obj)
+        for field in model._meta.concrete_fields:
+            related = field.related_model
+            if (not field.many_to_one or related not in self.buffers
+                    or self.keys[related] != ("pk",)):
+                continue
+            ids = {(getattr(obj, field.attname),) for obj in unique}
+            ids.discard((None,))
+            present = {
+                pk for pk, in existing_keys(
+                    related.objects.db_manager(self.using), ("pk",), ids)
+            } - self.rejected[related]
+            unique = [
+                obj for obj in unique
+                if getattr(obj, field.attname) in present
+                or getattr(obj, field.attname) is None
+            ]
+        self.skipped[model._meta.model_name] += len(objects) - len(unique)
+        return unique
+
+    def flush(self):
+        if not self.pending:
+            return
+        flushed = {}
+        with transaction.atomic(using=self.using):
+            for model, objects in self.buffers.items():
+                objects = objects and self.new_objects(model, objects)
+                if not objects:
+                    continue
+                # Размер INSERT выбирает бэкенд: в Django 2.2 явный
+                # batch_size не ограничивается лимитами SQLite.
+                model.objects.db_manager(self.using).bulk_create(
+                    objects, ignore_conflicts=True)
+                self.written[model._meta.model_name] += len(objects)
+                flushed[model] = objects
+        self.buffers = {model: [] for model in self.buffers}
+        self.pending = 0
+        if self.on_flush:
+            self.on_flush(flushed)
+
+
+def insert_sql(model, fields, connection):
+    """INSERT с пропуском конфликтов для колонок fields модели."""
+    ops = connection.ops
+    columns = ", ".join(
+        ops.quote_name(model._meta.get_field(name).column) for name in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    suffix = ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)
+    return (
+        f"{ops.insert_statement(ignore_conflicts=True)} "
+        f"{ops.quote_name(model._meta.db_table)} ({columns}) "
+        f"VALUES ({placeholders}) {suffix}"
+    )
+
+
+class RowWriter:
+    """Как BatchWriter, но для готовых кортежей значений.
+
+    Строки пишутся через executemany без сборки SQL в ORM на каждый
+    объект, поэтому значения должны быть уже в формате БД (даты —
+    через connection.ops.adapt_datetimefield_value).
+    """
+
+    def __init__(self, tables, batch_size, using=DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+        self.using = using
+        self.sql = {
+            model: insert_sql(model, fields, self.connection)
+            for model, fields in tables
+        }
+        self.buffers = {model: [] for model in self.sql}
+        self.batch_size = batch_size
+        self.pending = 0
+        self.written = Counter()
+
+    def add(self, model, row):
+        self.buffers[model].append(row)
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        with transaction.atomic(using=self.using):
+            with self.connection.cursor() as cursor:
+                for model, rows in self.buffers.items():
+                    if rows:
+                        cursor.executemany(self.sql[model], rows)
+                        self.written[model._meta.model_name] += len(rows)
+        self.buffers = {model: [] for model in self.buffers}
+        self.pending = 0
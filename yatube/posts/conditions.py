@@ -0,0 +1,139 @@
+import hashlib
+from functools import wraps
+
+from core.fragments import is_shared, page_owner
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.views.decorators.http import condition
+
+from .models import Follow, Group, Post, User
+from .shards import (author_history, count_author_posts, is_sharded,
+                     request_post, scatter)
+
+# Запись кеша страницы не нужно сбрасывать: изменившаяся страница
+# получает новый ключ. Срок ограничивает то, чего состояние не видит,
+# например переименование группы.
+PAGE_CACHE_TIMEOUT = 5 * 60
+
+
+def posts_state(querysets):
+    """Сводка наборов постов без рендеринга: число постов и время
+    последнего изменения. querysets — один набор, разложенный по базам.
+
+    Запросы раздельные: COUNT идёт по индексу, а MAX(updated) без
+    других агрегатов SQLite берёт из индекса по updated.
+    """
+    count, updated = 0, None
+    for posts in querysets:
+        posts = posts.order_by()
+        count += posts.count()
+        updated = max_time(
+            updated, posts.aggregate(updated=Max("updated"))["updated"])
+    return (count, updated), updated
+
+
+def max_time(*times):
+    return max((time for time in times if time), default=None)
+
+
+def index_state(request):
+    return posts_state(scatter(Post.objects.all()))
+
+
+def group_state(request, slug):
+    if not is_sharded():
+        return posts_state([Post.objects.filter(group__slug=slug)])
+    # Группы лежат в default: JOIN с ними на шарде невозможен.
+    group_id = Group.objects.filter(
+        slug=slug).values_list("pk", flat=True).first()
+    return posts_state(scatter(Post.objects.filter(group_id=group_id)))
+
+
+def profile_state(request, username):
+    if not is_sharded() and not settings.ARCHIVE_DATABASE:
+        querysets = [Post.objects.filter(author__username=username)]
+    else:
+        author_id = User.objects.filter(
+            username=username).values_list("pk", flat=True).first()
+        querysets = author_history(author_id)
+    parts, last_modified = posts_state(querysets)
+    if not is_shared():
+        parts += (request.user.is_authenticated
+                  and Follow.objects.filter(
+                      user=request.user, author__username=username).exists(),)
+    return parts, last_modified
+
+
+def post_detail_state(request, post_id):
+    """Состояние поста, его комментариев и счётчика постов автора. Пост
+    ищется один раз на запрос (request_post), его берёт и представление.
+    """
+    post = request_post(request, post_id)
+    if post is None:
+        return (0, None), None
+    # Комментарии лежат в базе поста, в шарде автора или в архиве.
+    stats = post.comments.aggregate(
+        count=Count("pk"), created=Max("created"))
+    parts = (1, post.updated, stats["count"], stats["created"],
+             count_author_posts(post.author_id))
+    return parts, max_time(post.updated, stats["created"])
+
+
+def page_count(request, index=0):
+    """Число постов ленты, если его уже посчитал conditional_page: первая
+    часть состояния лент — posts_state. index выбирает другой счётчик
+    состояния, например постов автора у post_detail_state.
+    """
+    parts = getattr(request, "_page_parts", None)
+    return parts[index] if parts and len(parts) > index else None
+
+
+def conditional_page(state_func):
+    """Отвечает 304 Not Modified, если состояние страницы не изменилось.
+
+    state_func(request, *args, **kwargs) возвращает кортеж частей ETag и
+    время последнего изменения. Считается один раз на запрос; в ETag
+    добавляется пользователь, потому что шапка страниц зависит от него.
+    """
+    def get_state(request, *args, **kwargs):
+        if not hasattr(request, "_page_state"):
+            parts, last_modified = state_func(request, *args, **kwargs)
+            request._page_parts = parts
+            parts += (request.user.pk,)
+            etag = hashlib.md5(repr(parts).encode()).hexdigest()
+            request._page_state = etag, last_modified
+        return request._page_state
+
+    return condition(
+        etag_func=lambda *args, **kwargs: get_state(*args, **kwargs)[0],
+        last_modified_func=lambda *args, **kwargs: get_state(
+            *args, **kwargs)[1]
+    )
+
+
+def cache_by_state(view_func):
+    """Кеширует ответ GET под ключом из URL, состояния страницы,
+    посчитанного conditional_page, и её владельца (page_owner).
+
+    В режимах PERSONALIZATION "esi" и "js" запись одна на всех
+    пользователей. Страницы с CSRF-токеном (форма комментария в режиме
+    inline) не кешируются: токен меняется при входе. Ставится под
+    conditional_page.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        parts = getattr(request, "_page_parts", None)
+        if request.method not in ("GET", "HEAD") or parts is None:
+            return view_func(request, *args, **kwargs)
+        state = (request.build_absolute_uri(), parts, page_owner(request))
+        digest = hashlib.md5(repr(state).encode()).hexdigest()
+        key = f"page.{view_func.__name__}.{digest}"
+        response = cache.get(key)
+        if response is None:
+            response = view_func(request, *args, **kwargs)
+            if (not response.streaming and response.status_code == 200
+                    and not request.META.get("CSRF_COOKIE_USED")):
+                cache.set(key, response, PAGE_CACHE_TIMEOUT)
+        return response
+    return wrapper
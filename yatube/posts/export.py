@@ -0,0 +1,108 @@
+import json
+import zipfile
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Group
+from .shards import author_history, scatter
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def post_records(author):
+    """Посты автора в формате import_yatube, по одной строке из БД."""
+    # Группы лежат в default, а посты могут лежать в шарде автора и в
+    # архиве.
+    slugs = dict(Group.objects.values_list("pk", "slug"))
+    fields = ("pk", "text", "created", "updated", "group_id", "image")
+    rows = (row for posts in author_history(author.pk)
+            for row in posts.order_by("pk").values(*fields).iterator(
+                chunk_size=EXPORT_CHUNK_SIZE))
+    for row in rows:
+        yield {
+            "type": "post",
+            "id": row["pk"],
+            "author": author.username,
+            "group": slugs.get(row["group_id"]),
+            "text": row["text"],
+            "created": row["created"],
+            "updated": row["updated"],
+            "image": row["image"] or None,
+            "image_url": (default_storage.url(row["image"])
+                          if row["image"] else None),
+        }
+
+
+def comment_records(author):
+    """Комментарии автора к постам из всех баз, включая архив."""
+    comments = Comment.objects.filter(author=author).order_by("pk").values(
+        "pk", "post_id", "text", "created")
+    rows = (row for shard_comments in scatter(comments, archive=True)
+            for row in shard_comments.iterator(chunk_size=EXPORT_CHUNK_SIZE))
+    for row in rows:
+        yield {
+            "type": "comment",
+            "id": row["pk"],
+            "post": row["post_id"],
+            "author": author.username,
+            "text": row["text"],
+            "created": row["created"],
+        }
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield (json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False)
+               + "\n").encode()
+
+
+def export_ndjson(author):
+    """Посты и комментарии автора потоком строк NDJSON."""
+    yield from ndjson_lines(post_records(author))
+    yield from ndjson_lines(comment_records(author))
+
+
+class StreamBuffer:
+    """Файл без seek, в который пишет zipfile; байты забираются pop()."""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_zip(author):
+    """ZIP с posts.ndjson и comments.ndjson, отдаваемый по мере сжатия."""
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, records in (("posts.ndjson", post_records(author)),
+                              ("comments.ndjson", comment_records(author))):
+            with archive.open(name, "w", force_zip64=True) as member:
+                for line in ndjson_lines(records):
+                    member.write(line)
+                    if buffer.chunks:
+                        yield buffer.pop()
+            yield buffer.pop()
+    yield buffer.pop()
+
+
+EXPORT_FORMATS = {
+    "ndjson": (export_ndjson, "application/x-ndjson", "ndjson"),
+    "zip": (export_zip, "application/zip", "zip"),
+}
@@ -0,0 +1,110 @@
+import calendar
+import heapq
+from datetime import datetime, timezone
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+from .models import Post
+from .shards import attach_relations, author_posts, scatter, with_relations
+
+
+def encode_cursor(created, pk):
+    """Кодирует позицию поста в ленте как `<микросекунды>_<id>`."""
+    seconds = calendar.timegm(created.utctimetuple())
+    return f"{seconds * 10 ** 6 + created.microsecond}_{pk}"
+
+
+def decode_cursor(value):
+    """Возвращает (created, id) из курсора или None, если он неверный."""
+    try:
+        micros, pk = (int(part) for part in value.split("_"))
+        created = datetime.fromtimestamp(micros // 10 ** 6, tz=timezone.utc)
+    except (AttributeError, ValueError, OverflowError, OSError):
+        return None
+    return created.replace(microsecond=micros % 10 ** 6), pk
+
+
+def after_cursor(queryset, cursor=None):
+    """Упорядочивает queryset по (-created, -id) и отбрасывает записи
+    до cursor включительно.
+    """
+    queryset = queryset.order_by("-created", "-pk")
+    if cursor is None:
+        return queryset
+    created, pk = cursor
+    return queryset.filter(
+        Q(created__lt=created) | Q(created=created, pk__lt=pk)
+    )
+
+
+def keyset_stream(queryset, limit, cursor=None):
+    """Не больше limit постов queryset, идущих после cursor."""
+    return iter(after_cursor(queryset, cursor)[:limit])
+
+
+def merge_streams(streams, limit):
+    """k-путевое слияние упорядоченных потоков постов без повторов."""
+    merged = heapq.merge(
+        *streams,
+        key=lambda post: (post.created, post.pk),
+        reverse=True
+    )
+    posts = []
+    last_pk = None
+    for post in merged:
+        # Один пост может прийти и от автора, и из группы: с равными
+        # ключами они стоят в слиянии рядом.
+        if post.pk == last_pk:
+            continue
+        last_pk = post.pk
+        posts.append(post)
+        if len(posts) == limit:
+            break
+    return posts
+
+
+def merged_page(querysets, number, per_page, count=None):
+    """Страница постов нескольких баз (scatter-gather).
+
+    Каждая база отдаёт первые number * per_page постов по (-created,
+    -id), merge_streams сливает их. Глубокие страницы читают с каждой
+    базы все посты до себя; для долгой прокрутки есть курсорная лента.
+    count, если уже посчитан, избавляет от COUNT по каждой базе.
+    """
+    paginator = Paginator(Post.objects.none(), per_page)
+    if count is None:
+        count = sum(queryset.count() for queryset in querysets)
+    paginator.count = count
+    number = paginator.get_page(number).number
+    limit = number * per_page
+    posts = merge_streams(
+        (keyset_stream(queryset, limit) for queryset in querysets), limit)
+    return Page(posts[limit - per_page:], number, paginator)
+
+
+def merged_feed(user, page_size, cursor=None):
+    """Страница ленты из постов избранных авторов и групп.
+
+    Каждый источник — отдельный автор или группа — читается по своему
+    индексу и отдаёт не больше page_size + 1 постов. Возвращает посты
+    страницы и курсор следующей страницы (или None).
+    """
+    sources = [
+        author_posts(author_id)
+        for author_id in user.follower.values_list("author_id", flat=True)
+    ]
+    for group_id in user.group_subscriptions.values_list(
+            "group_id", flat=True):
+        sources += scatter(Post.objects.filter(group_id=group_id))
+    page = merge_streams(
+        (keyset_stream(with_relations(source, "author", "group"),
+                       page_size + 1, cursor)
+         for source in sources),
+        page_size + 1
+    )
+    attach_relations(page, "author", "group")
+    if len(page) > page_size:
+        last = page[page_size - 1]
+        return page[:page_size], encode_cursor(last.created, last.pk)
+    return page, None
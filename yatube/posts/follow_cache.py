@@ -0,0 +1,199 @@
+import hashlib
+import uuid
+
+from core.stale import acquire_lock, release_lock
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import transaction
+
+from .conditions import posts_state
+from .feeds import merged_page
+from .models import Follow, Post
+from .shards import attach_relations, is_sharded, posts_by_ids, scatter
+
+FOLLOW_FEED_TIMEOUT = 60 * 60
+# Авторы с большим числом подписчиков не сбрасывают их ленты по одной:
+# у них своё поколение, которое читают только их подписчики.
+FANOUT_MAX_FOLLOWERS = 100
+LARGE_AUTHORS_KEY = "follow_feed.large_authors"
+
+
+def generation_key(user_id):
+    return f"follow_feed.{user_id}"
+
+
+def author_generation_key(author_id):
+    return f"follow_feed.author.{author_id}"
+
+
+def drop_generations(keys):
+    """Сброс повторяется после коммита: иначе запрос, прочитавший ленту
+    до коммита, мог бы положить в кеш старые id под новым поколением.
+    """
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_follow_feed(user_ids):
+    """Сбрасывает кешированные ленты подписок пользователей: после
+    подписки или отписки.
+    """
+    drop_generations([generation_key(user_id) for user_id in set(user_ids)])
+
+
+def invalidate_author_feeds(author_ids):
+    """Сбрасывает ленты подписок всех подписчиков авторов.
+
+    У автора не больше FANOUT_MAX_FOLLOWERS подписчиков сбрасываются
+    поколения самих подписчиков, у более крупного — одно поколение
+    автора: запись стоит не больше FANOUT_MAX_FOLLOWERS ключей, а ленте
+    подписок достаточно поколений крупных авторов.
+    """
+    keys = []
+    for author_id in set(author_ids):
+        follower_ids = list(Follow.objects.filter(
+            author_id=author_id).values_list(
+                "user_id", flat=True)[:FANOUT_MAX_FOLLOWERS + 1])
+        if len(follower_ids) <= FANOUT_MAX_FOLLOWERS:
+            keys.extend(generation_key(user_id) for user_id in follower_ids)
+            continue
+        keys.append(author_generation_key(author_id))
+        if author_id not in large_authors():
+            announce_large_author(author_id)
+    drop_generations(sorted(set(keys)))
+
+
+def large_authors():
+    return cache.get(LARGE_AUTHORS_KEY) or set()
+
+
+def announce_large_author(author_id):
+    """Добавляет автора в список крупных и один раз сбрасывает ленты
+    всех его подписчиков: собранные раньше не учитывают его поколения.
+    Если список занят другим процессом или вытеснен из кеша, автор
+    объявляется снова при следующей записи.
+    """
+    path = acquire_lock(LARGE_AUTHORS_KEY)
+    if path is not None:
+        try:
+            authors = large_authors()
+            authors.add(author_id)
+            cache.set(LARGE_AUTHORS_KEY, authors, None)
+        finally:
+            release_lock(path)
+    invalidate_follow_feed(Follow.objects.filter(
+        author_id=author_id).values_list("user_id", flat=True))
+
+
+def generations(keys):
+    """Поколения под ключами keys; недостающие заводятся заново."""
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            generation = uuid.uuid4().hex
+            if not cache.add(key, generation, FOLLOW_FEED_TIMEOUT):
+                generation = cache.get(key, generation)
+            found[key] = generation
+    return [found[key] for key in keys]
+
+
+def followed_authors(user, user_generation):
+    """id авторов, на которых подписан user, из кеша под поколением
+    пользователя.
+    """
+    key = f"follow_feed.{user.pk}.{user_generation}.authors"
+    author_ids = cache.get(key)
+    if author_ids is None:
+        author_ids = list(Follow.objects.filter(
+            user=user).values_list("author_id", flat=True))
+        cache.set(key, author_ids, FOLLOW_FEED_TIMEOUT)
+    return author_ids
+
+
+def page_number(number):
+    try:
+        return max(int(number), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def build_entry(user, author_ids, number):
+    """Запись кеша для страницы number и, при шардах, сами посты
+    страницы: повторно по id их читать не нужно.
+    """
+    page_posts = None
+    if is_sharded():
+        # Подписки лежат в default, посты авторов — по шардам.
+        querysets = scatter(Post.objects.filter(author_id__in=author_ids))
+        (count, updated), _ = posts_state(querysets)
+        page = merged_page(querysets, number, settings.COUNT_POSTS, count)
+        page_posts = list(page)
+        ids = [post.pk for post in page_posts]
+    else:
+        posts = Post.objects.filter(author__following__user=user)
+        (count, updated), _ = posts_state([posts])
+        paginator = Paginator(posts.values_list("pk", flat=True),
+                              settings.COUNT_POSTS)
+        # count уже известен: Paginator не станет считать его ещё раз.
+        paginator.count = count
+        page = paginator.get_page(number)
+        ids = list(page.object_list)
+    entry = {
+        "count": count,
+        "updated": updated,
+        "number": page.number,
+        "ids": ids,
+    }
+    return entry, page_posts
+
+
+def follow_feed_entry(request):
+    """id постов страницы ленты подписок, их число и время изменения.
+
+    Запись лежит в кеше под поколением пользователя и поколениями
+    крупных авторов из его подписок (см. invalidate_author_feeds) и
+    считается один раз на запрос.
+    """
+    if hasattr(request, "_follow_feed"):
+        return request._follow_feed
+    user = request.user
+    number = page_number(request.GET.get("page"))
+    user_generation, = generations([generation_key(user.pk)])
+    author_ids = followed_authors(user, user_generation)
+    large = large_authors()
+    parts = [user_generation] + generations(
+        [author_generation_key(author_id)
+         for author_id in author_ids if author_id in large])
+    generation = hashlib.md5(repr(parts).encode()).hexdigest()
+    key = f"follow_feed.{user.pk}.{generation}.{number}"
+    entry = cache.get(key)
+    if entry is None:
+        entry, request._follow_feed_posts = build_entry(
+            user, author_ids, number)
+        cache.set(key, entry, FOLLOW_FEED_TIMEOUT)
+    entry["generation"] = generation
+    request._follow_feed = entry
+    return entry
+
+
+def follow_feed_page(request):
+    """Страница ленты подписок запросом pk__in по id из кеша."""
+    entry = follow_feed_entry(request)
+    paginator = Paginator(Post.objects.none(), settings.COUNT_POSTS)
+    paginator.count = entry["count"]
+    posts = getattr(request, "_follow_feed_posts", None)
+    if posts is None:
+        posts = posts_by_ids(entry["ids"])
+    else:
+        attach_relations(posts, "author", "group")
+    return Page(posts, entry["number"], paginator)
+
+
+def follow_state(request):
+    """Состояние ленты подписок для conditional_page без JOIN."""
+    entry = follow_feed_entry(request)
+    parts = (entry["generation"], entry["number"], entry["count"])
+    return parts, entry["updated"]
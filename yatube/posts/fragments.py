@@ -0,0 +1,39 @@
+from core.fragments import register
+from django.http import Http404
+
+from .forms import CommentForm
+from .models import Follow, GroupSubscription
+from .shards import request_post
+
+
+@register("post", "fragments/post.html")
+def post_context(request, key):
+    """Кнопка редактирования и форма комментария под постом."""
+    if not key.isdigit():
+        raise Http404(key)
+    user = request.user
+    # Встроенный фрагмент берёт пост, уже найденный страницей поста.
+    post = request_post(request, key) if user.is_authenticated else None
+    can_edit = post is not None and post.author_id == user.pk
+    # После отклонённого комментария post_detail оставляет форму с
+    # ошибками.
+    form = getattr(request, "_comment_form", None) or CommentForm()
+    return {"post_id": key, "can_edit": can_edit, "form": form}
+
+
+@register("profile", "fragments/profile.html")
+def profile_context(request, key):
+    user = request.user
+    following = (user.is_authenticated and user.username != key
+                 and Follow.objects.filter(
+                     user=user, author__username=key).exists())
+    return {"username": key, "following": following}
+
+
+@register("group", "fragments/group.html")
+def group_context(request, key):
+    user = request.user
+    subscribed = (user.is_authenticated
+                  and GroupSubscription.objects.filter(
+                      user=user, group__slug=key).exists())
+    return {"slug": key, "subscribed": subscribed}
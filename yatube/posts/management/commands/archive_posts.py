@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from django.utils import timezone
+from posts.follow_cache import invalidate_author_feeds
+from posts.models import Post
+from posts.shards import move_posts
+
+# Посты пачки попадают в IN (...) и укладываются в лимит SQLite (999).
+ARCHIVE_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит посты старше --days дней вместе с комментариями из "
+        "основной базы или шардов в архив (ARCHIVE_DATABASE) пачками. "
+        "Профиль, страница поста и выгрузка читают архив, ленты — нет."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.ARCHIVE_AFTER_DAYS,
+            help="Возраст поста в днях, после которого он уходит в архив."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=ARCHIVE_BATCH_SIZE,
+            help="Сколько постов переносить одной транзакцией."
+        )
+
+    def handle(self, *args, **options):
+        archive = settings.ARCHIVE_DATABASE
+        if not archive:
+            raise CommandError("Архив не настроен: ARCHIVE_DATABASE пуст.")
+        # Граница фиксируется, чтобы не гоняться за постами, стареющими
+        # во время переноса.
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        batch_size = options["batch_size"]
+        total = 0
+        for source in settings.DATABASE_SHARDS or ["default"]:
+            old = Post.objects.using(source).filter(created__lt=cutoff)
+            author_ids = list(old.order_by().values_list(
+                "author_id", flat=True).distinct())
+            try:
+                moved = move_posts(old, archive, batch_size)
+            except IntegrityError as error:
+                raise CommandError(error)
+            total += moved
+            if moved:
+                self.stdout.write(f"{source} -> {archive}, постов: {moved}")
+            # В кешированных лентах подписок остались id ушедших постов.
+            invalidate_author_feeds(author_ids)
+        self.stdout.write(f"Перенесено в архив постов: {total}")
@@ -0,0 +1,157 @@
+import json
+import platform
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет маршруты posts на текущей базе: перцентили задержки, "
+        "число и время SQL-запросов, размер ответа. Сохраняет JSON и "
+        "сравнивает с базовым замером."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=1)
+        parser.add_argument(
+            "--cold-cache", action="store_true",
+            help="Очищать кеш перед каждым запросом."
+        )
+        parser.add_argument(
+            "--only", nargs="*", default=(),
+            help="Имена сценариев или маршрутов, например posts:index."
+        )
+        parser.add_argument("--output", help="Куда сохранить JSON.")
+        parser.add_argument("--baseline", help="JSON прошлого замера.")
+        parser.add_argument(
+            "--tolerance", type=float, default=benchmarks.DEFAULT_TOLERANCE)
+        parser.add_argument(
+            "--templates", action="store_true",
+            help="Сравнить рендеринг лент без кеша шаблонов и с ним."
+        )
+        parser.add_argument(
+            "--sqlite", action="store_true",
+            help="Сравнить чтение и запись в потоках с настройками SQLite "
+                 "по умолчанию и с SQLITE_PRODUCTION_PRAGMAS."
+        )
+        parser.add_argument(
+            "--replicas", type=int, default=0,
+            help="Сравнить чтение лент с основной базы и с N копий-реплик "
+                 "при записи в основную."
+        )
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--seconds", type=float, default=10)
+
+    def handle(self, *args, **options):
+        if options["templates"]:
+            self.bench_templates(options["repeat"])
+            return
+        if options["sqlite"]:
+            self.bench_sqlite(
+                options["readers"], options["writers"], options["seconds"])
+            return
+        if options["replicas"]:
+            self.bench_sqlite(
+                options["readers"], options["writers"], options["seconds"],
+                options["replicas"])
+            return
+        self.bench_routes(options)
+
+    def bench_routes(self, options):
+        scenarios = [
+            scenario for scenario in benchmarks.build_scenarios()
+            if not options["only"] or any(
+                scenario.name.startswith(name) for name in options["only"])
+        ]
+        if not scenarios:
+            raise CommandError(
+                "Нет сценариев: база пуста? Заполните её seed_yatube.")
+        mode = benchmarks.cache_mode(options["cold_cache"])
+        previous = None
+        if options["baseline"]:
+            previous = self.load_baseline(options["baseline"], mode)
+        if options["cold_cache"]:
+            self.stdout.write("Кеш: cold, очищается перед каждым запросом.")
+        else:
+            self.stdout.write(
+                f"Кеш: warm, прогрет {options['warmup']} запросами "
+                "на сценарий.")
+        results = benchmarks.run(
+            scenarios, options["repeat"], options["warmup"],
+            options["cold_cache"]
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:34} p50 {result['p50_ms']:8.1f} мс  "
+                f"p99 {result['p99_ms']:8.1f} мс  "
+                f"SQL {result['queries']:3} / {result['sql_ms']:7.1f} мс  "
+                f"{result['size']:8} Б"
+            )
+        if options["output"]:
+            report = {
+                "meta": {
+                    "date": timezone.now().isoformat(),
+                    "python": platform.python_version(),
+                    "database": connection.vendor,
+                    "repeat": options["repeat"],
+                    "warmup": options["warmup"],
+                    "cache": mode,
+                },
+                "results": results,
+            }
+            with open(options["output"], "w", encoding="utf-8") as output:
+                json.dump(report, output, indent=2, ensure_ascii=False)
+        if previous is not None:
+            regressions = benchmarks.compare(
+                results, previous["results"], options["tolerance"])
+            if regressions:
+                raise CommandError(
+                    "Регрессии производительности:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("Регрессий нет."))
+
+    def load_baseline(self, path, mode):
+        """Базовый замер; замеры с холодным и тёплым кешем несравнимы."""
+        with open(path, encoding="utf-8") as baseline:
+            previous = json.load(baseline)
+        previous_mode = previous["meta"].get("cache", mode)
+        if previous_mode != mode:
+            raise CommandError(
+                f"Базовый замер снят с кешем {previous_mode}, текущий "
+                f"— с кешем {mode}: сравнивать их нельзя.")
+        return previous
+
+    def bench_templates(self, repeat):
+        results = benchmarks.run_templates(repeat)
+        if not results:
+            raise CommandError(
+                "Нет постов в группах: заполните базу seed_yatube.")
+        for name, result in results.items():
+            line = (
+                f"{name:24} без кеша {result['plain_ms']:7.2f} мс  "
+                f"с кешем {result['cached_ms']:7.2f} мс"
+            )
+            if "jinja2_ms" in result:
+                line += f"  Jinja2 {result['jinja2_ms']:7.2f} мс"
+            self.stdout.write(line)
+
+    def bench_sqlite(self, readers, writers, seconds, replicas=0):
+        if connection.vendor != "sqlite":
+            raise CommandError("Замер только для SQLite.")
+        if replicas:
+            results = benchmarks.run_replicas(
+                readers, writers, seconds, replicas)
+        else:
+            results = benchmarks.run_sqlite(readers, writers, seconds)
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:12} чтений {result['reads_per_s']:8.1f}/с  "
+                f"p99 {result['read_p99_ms']:7.1f} мс  "
+                f"записей {result['writes_per_s']:7.1f}/с  "
+                f"p99 {result['write_p99_ms']:7.1f} мс  "
+                f"ошибок {result['errors']}"
+            )
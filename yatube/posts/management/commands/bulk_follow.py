@@ -0,0 +1,71 @@
+import csv
+import sys
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from posts.follow_cache import invalidate_follow_feed
+from posts.models import FOLLOW_BATCH_SIZE, Follow
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Подписывает (или отписывает) пользователей на авторов пачками. "
+        "Принимает CSV из строк `подписчик,автор` (имена пользователей)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?", default="-",
+            help="CSV-файл с парами; `-` — читать из stdin."
+        )
+        parser.add_argument(
+            "--unfollow", action="store_true",
+            help="Удалить подписки вместо создания."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=FOLLOW_BATCH_SIZE,
+            help="Сколько строк CSV читать и обрабатывать за раз."
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if options["path"] == "-":
+            self.process(sys.stdin, options["unfollow"], batch_size)
+            return
+        with open(options["path"], newline="", encoding="utf-8") as source:
+            self.process(source, options["unfollow"], batch_size)
+
+    def process(self, source, unfollow, batch_size):
+        rows = (row for row in csv.reader(source) if len(row) >= 2)
+        total = 0
+        while True:
+            batch = [
+                (user.strip(), author.strip())
+                for user, author, *_ in islice(rows, batch_size)
+            ]
+            if not batch:
+                break
+            pairs = self.resolve(batch)
+            if unfollow:
+                Follow.objects.unfollow_pairs(pairs)
+            else:
+                Follow.objects.follow_pairs(pairs)
+            invalidate_follow_feed(user for user, _ in pairs)
+            total += len(pairs)
+        action = "Отписок" if unfollow else "Подписок"
+        self.stdout.write(f"{action} обработано: {total}")
+
+    def resolve(self, batch):
+        usernames = list({name for pair in batch for name in pair})
+        ids = {}
+        for start in range(0, len(usernames), FOLLOW_BATCH_SIZE):
+            ids.update(User.objects.filter(
+                username__in=usernames[start:start + FOLLOW_BATCH_SIZE]
+            ).values_list("username", "pk"))
+        return [
+            (ids[user], ids[author]) for user, author in batch
+            if user in ids and author in ids
+        ]
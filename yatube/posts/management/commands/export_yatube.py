@@ -0,0 +1,36 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from posts.export import EXPORT_FORMATS
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Потоково выгружает посты и комментарии автора в NDJSON или ZIP."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument(
+            "--format", choices=EXPORT_FORMATS, default="ndjson")
+        parser.add_argument(
+            "--output", default="-", help="Файл; `-` — stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(
+                f"Пользователь {options['username']} не найден.")
+        export = EXPORT_FORMATS[options["format"]][0]
+        if options["output"] == "-":
+            self.write(export(author), sys.stdout.buffer)
+            return
+        with open(options["output"], "wb") as output:
+            self.write(export(author), output)
+
+    def write(self, chunks, output):
+        for chunk in chunks:
+            output.write(chunk)
+        output.flush()
@@ -0,0 +1,226 @@
+import csv
+import json
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from posts.bulk import BatchWriter, preserve_timestamps
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+RECORD_TYPES = ("user", "group", "post", "comment", "follow")
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоково импортирует пользователей, группы, посты, комментарии "
+        "и подписки из JSONL или CSV. Тип записи берётся из поля `type` "
+        "или из --type. Авторы и группы указываются по username и slug, "
+        "комментарии ссылаются на id поста. Посты и комментарии с уже "
+        "занятым id и комментарии к незаписанным постам пропускаются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format", choices=("jsonl", "csv"),
+            help="По умолчанию определяется по расширению файла."
+        )
+        parser.add_argument(
+            "--type", choices=RECORD_TYPES,
+            help="Тип всех записей файла, если в них нет поля `type`."
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--image-root", default=settings.MEDIA_ROOT,
+            help="Каталог, от которого считаются пути картинок."
+        )
+        parser.add_argument("--report-every", type=int, default=100000)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.usernames = dict(User.objects.values_list("username", "pk"))
+        self.slugs = dict(Group.objects.values_list("slug", "pk"))
+        self.new_usernames = set()
+        self.new_slugs = set()
+        self.skipped = 0
+        self.writer = BatchWriter(
+            (Group, User, Post, Comment, Follow),
+            options["batch_size"],
+            on_flush=self.resolve_new,
+            keys={
+                User: ("username",),
+                Group: ("slug",),
+                Follow: ("user_id", "author_id"),
+            }
+        )
+        started = time.monotonic()
+        rows = 0
+        with preserve_timestamps(Post, Comment):
+            for rows, record in enumerate(self.read(), start=1):
+                self.add(record)
+                if rows % options["report_every"] == 0:
+                    self.report(rows, started)
+            self.writer.flush()
+        self.report(rows, started)
+        written = ", ".join(
+            f"{name}: {count}" for name, count in self.writer.written.items()
+        )
+        skipped = self.skipped + sum(self.writer.skipped.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Импорт завершён. {written or 'ничего не записано'}; "
+            f"пропущено: {skipped}"
+        ))
+        for name, count in self.writer.skipped.items():
+            if count:
+                self.stdout.write(
+                    f"{name}: {count} с занятым id или без связанной записи")
+
+    def read(self):
+        path = self.options["path"]
+        file_format = self.options["format"] or (
+            "csv" if path.endswith(".csv") else "jsonl")
+        with open(path, newline="", encoding="utf-8") as source:
+            if file_format == "csv":
+                for row in csv.DictReader(source):
+                    yield {key: value or None for key, value in row.items()}
+                return
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+    def report(self, rows, started):
+        elapsed = time.monotonic() - started
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(f"{rows} строк за {elapsed:.1f} с ({rate:.0f}/с)")
+
+    def add(self, record):
+        record_type = record.get("type") or self.options["type"]
+        if record_type not in RECORD_TYPES:
+            raise CommandError(f"Неизвестный тип записи: {record_type}")
+        obj = getattr(self, f"build_{record_type}")(record)
+        if obj is None:
+            self.skipped += 1
+            return
+        self.writer.add(obj)
+
+    def resolve_new(self, flushed):
+        """Дополняет карты id пользователей и групп после записи пачки."""
+        if User in flushed:
+            self.usernames.update(User.objects.filter(
+                username__in=self.new_usernames
+            ).values_list("username", "pk"))
+            self.new_usernames.clear()
+        if Group in flushed:
+            self.slugs.update(Group.objects.filter(
+                slug__in=self.new_slugs).values_list("slug", "pk"))
+            self.new_slugs.clear()
+
+    def user_id(self, username):
+        if username in self.new_usernames:
+            self.writer.flush()
+        return self.usernames.get(username)
+
+    def group_id(self, slug):
+        if slug in self.new_slugs:
+            self.writer.flush()
+        return self.slugs.get(slug)
+
+    def record_id(self, value):
+        return int(value) if value else None
+
+    def created(self, record):
+        return (parse_datetime(record.get("created") or "")
+                or timezone.now())
+
+    def build_user(self, record):
+        username = record["username"]
+        if username in self.usernames or username in self.new_usernames:
+            return None
+        self.new_usernames.add(username)
+        user = User(
+            username=username,
+            first_name=record.get("first_name") or "",
+            last_name=record.get("last_name") or "",
+            email=record.get("email") or ""
+        )
+        user.set_unusable_password()
+        return user
+
+    def build_group(self, record):
+        slug = record["slug"]
+        if slug in self.slugs or slug in self.new_slugs:
+            return None
+        self.new_slugs.add(slug)
+        return Group(
+            slug=slug,
+            title=record.get("title") or slug,
+            description=record.get("description") or ""
+        )
+
+    def build_post(self, record):
+        author_id = self.user_id(record.get("author"))
+        if author_id is None:
+            return None
+        group_id = None
+        if record.get("group"):
+            group_id = self.group_id(record["group"])
+        created = self.created(record)
+        return Post(
+            pk=self.record_id(record.get("id")),
+            author_id=author_id,
+            group_id=group_id,
+            text=record.get("text") or "",
+            image=self.attach_image(record.get("image")),
+            created=created,
+            updated=created
+        )
+
+    def build_comment(self, record):
+        author_id = self.user_id(record.get("author"))
+        if author_id is None or not record.get("post"):
+            return None
+        return Comment(
+            pk=self.record_id(record.get("id")),
+            post_id=self.record_id(record["post"]),
+            author_id=author_id,
+            text=record.get("text") or "",
+            created=self.created(record)
+        )
+
+    def build_follow(self, record):
+        user_id = self.user_id(record.get("user"))
+        author_id = self.user_id(record.get("author"))
+        if None in (user_id, author_id) or user_id == author_id:
+            return None
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def attach_image(self, path):
+        """Имя файла в хранилище для картинки по пути из данных.
+
+        Путь считается от --image-root и не может выходить за него.
+        Файлы внутри MEDIA_ROOT используются на месте, остальные
+        копируются в хранилище.
+        """
+        if not path:
+            return None
+        image_root = os.path.realpath(self.options["image_root"])
+        full_path = os.path.realpath(os.path.join(image_root, path))
+        if not full_path.startswith(image_root + os.sep):
+            self.stderr.write(f"Картинка вне --image-root пропущена: {path}")
+            return None
+        media_root = os.path.realpath(settings.MEDIA_ROOT)
+        if full_path.startswith(media_root + os.sep):
+            return os.path.relpath(full_path, media_root)
+        if not os.path.isfile(full_path):
+            return None
+        with open(full_path, "rb") as image:
+            return default_storage.save(
+                f"posts/{os.path.basename(full_path)}", File(image))
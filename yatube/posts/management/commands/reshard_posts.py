@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from django.db.models import Max
+from posts.models import AuthorShard, Comment, Post, Ticket
+from posts.shards import (author_shard_key, hash_shard, move_posts,
+                          shard_for)
+
+User = get_user_model()
+
+# Посты пачки попадают в IN (...) и укладываются в лимит SQLite (999).
+RESHARD_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит посты авторов вместе с комментариями между шардами "
+        "пачками. Авторов из аргументов — в базу --to, с --rebalance — "
+        "все посты, лежащие не в шарде своего автора, в том числе из "
+        "default после включения шардов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="*")
+        parser.add_argument(
+            "--to", help="Алиас шарда для авторов из аргументов."
+        )
+        parser.add_argument(
+            "--rebalance", action="store_true",
+            help="Разложить все посты по шардам их авторов."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=RESHARD_BATCH_SIZE,
+            help="Сколько постов переносить одной транзакцией."
+        )
+
+    def handle(self, *args, **options):
+        shards = settings.DATABASE_SHARDS
+        if not shards:
+            raise CommandError("Шарды не настроены: DATABASE_SHARDS пуст.")
+        # Посты могли быть созданы до шардов в default.
+        self.sources = list(dict.fromkeys(["default", *shards]))
+        self.batch_size = options["batch_size"]
+        self.reserve_ids()
+        if options["rebalance"]:
+            for author_id, source in self.misplaced():
+                self.move(author_id, source, shard_for(author_id))
+            return
+        target = options["to"]
+        if target not in shards or not options["usernames"]:
+            raise CommandError(
+                "Укажите авторов и --to из DATABASE_SHARDS или --rebalance."
+            )
+        for username in options["usernames"]:
+            author = User.objects.filter(username=username).first()
+            if author is None:
+                raise CommandError(f"Нет пользователя {username}.")
+            # Сначала назначение: новые посты автора сразу пишутся в
+            # target. Повторный проход забирает то, что записали в старую
+            # базу процессы, ещё не увидевшие назначение.
+            self.assign(author.pk, target)
+            for _ in range(2):
+                for source in self.sources:
+                    if source != target:
+                        self.move(author.pk, source, target)
+
+    def reserve_ids(self):
+        """Новые id из Ticket не должны совпасть с уже выданными базами."""
+        top = max(
+            (model.objects.using(alias).aggregate(top=Max("pk"))["top"] or 0
+             for model in (Post, Comment) for alias in self.sources),
+            default=0
+        )
+        Ticket.objects.reserve(top)
+
+    def misplaced(self):
+        for source in self.sources:
+            author_ids = Post.objects.using(source).order_by().values_list(
+                "author_id", flat=True).distinct()
+            for author_id in list(author_ids):
+                if shard_for(author_id) != source:
+                    yield author_id, source
+
+    def assign(self, author_id, target):
+        if target == hash_shard(author_id):
+            AuthorShard.objects.filter(author_id=author_id).delete()
+        else:
+            AuthorShard.objects.update_or_create(
+                author_id=author_id, defaults={"database": target})
+        cache.delete(author_shard_key(author_id))
+
+    def move(self, author_id, source, target):
+        posts = Post.objects.using(source).filter(author_id=author_id)
+        try:
+            moved = move_posts(posts, target, self.batch_size)
+        except IntegrityError as error:
+            raise CommandError(error)
+        if moved:
+            self.stdout.write(
+                f"Автор {author_id}: {source} -> {target}, постов: {moved}")
@@ -0,0 +1,223 @@
+import base64
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from posts.bulk import BatchWriter, RowWriter
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+WORDS = (
+    "пост лента автор группа город утро вечер новости код python django "
+    "кофе книга фильм музыка дорога море горы работа проект идея вопрос "
+    "ответ история фото друг время неделя день ночь лето зима весна осень "
+    "сегодня вчера завтра отличный новый старый быстрый медленный важный"
+).split()
+POST_COLUMNS = (
+    "id", "author", "group", "text", "image", "created", "updated")
+COMMENT_COLUMNS = ("id", "post", "author", "text", "created")
+SEED_IMAGE = base64.b64decode(
+    "R0lGODlhAgABAIAAAAAAAP///yH5BAAAAAAALAAAAAACAAEAAAICDAoAOw=="
+)
+
+
+def power_law_weights(count, alpha):
+    """Накопленные веса Ципфа: i-й объект выбирается с весом 1/i^alpha."""
+    return list(accumulate(1 / (rank ** alpha)
+                           for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует большой набор данных для нагрузочных сценариев: "
+        "пользователей, группы, посты со степенным распределением по "
+        "авторам и группам, комментарии, подписки и картинки."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--groups", type=int, default=50)
+        parser.add_argument("--posts", type=int, default=100000)
+        parser.add_argument(
+            "--comments", type=float, default=2.0,
+            help="Среднее число комментариев на пост."
+        )
+        parser.add_argument(
+            "--follows", type=float, default=20.0,
+            help="Среднее число подписок на пользователя."
+        )
+        parser.add_argument(
+            "--no-group", type=float, default=0.3,
+            help="Доля постов без группы."
+        )
+        parser.add_argument(
+            "--images", type=float, default=0.0,
+            help="Доля постов с картинкой."
+        )
+        parser.add_argument(
+            "--alpha", type=float, default=1.1,
+            help="Показатель степенного распределения."
+        )
+        parser.add_argument("--days", type=int, default=365 * 3)
+        parser.add_argument("--prefix", default="seed")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.random = random.Random(options["seed"])
+        self.started = time.monotonic()
+        if connection.vendor == "sqlite" and not connection.in_atomic_block:
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA synchronous = OFF")
+        self.writer = BatchWriter((User, Group), options["batch_size"])
+        self.rows = RowWriter((
+            (Post, POST_COLUMNS),
+            (Comment, COMMENT_COLUMNS),
+            (Follow, ("user", "author")),
+        ), options["batch_size"])
+        user_ids = self.create_users()
+        group_ids = self.create_groups()
+        self.create_posts(user_ids, group_ids)
+        self.create_follows(user_ids)
+        self.rows.flush()
+        written = ", ".join(
+            f"{name}: {count}" for name, count in
+            (self.writer.written + self.rows.written).items()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово за {time.monotonic() - self.started:.1f} с. {written}"
+        ))
+
+    def progress(self, stage, done):
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(f"{stage}: {done} ({elapsed:.1f} с)")
+
+    def create_users(self):
+        prefix = self.options["prefix"]
+        for number in range(self.options["users"]):
+            self.writer.add(User(
+                username=f"{prefix}_user_{number}",
+                first_name=self.random.choice(WORDS).title(),
+                password="!"
+            ))
+        self.writer.flush()
+        self.progress("Пользователи", self.options["users"])
+        return list(User.objects.filter(
+            username__startswith=f"{prefix}_user_"
+        ).order_by("pk").values_list("pk", flat=True))
+
+    def create_groups(self):
+        prefix = self.options["prefix"]
+        for number in range(self.options["groups"]):
+            self.writer.add(Group(
+                slug=f"{prefix}-group-{number}",
+                title=f"Группа {number}",
+                description=self.text(20)
+            ))
+        self.writer.flush()
+        return list(Group.objects.filter(
+            slug__startswith=f"{prefix}-group-"
+        ).order_by("pk").values_list("pk", flat=True))
+
+    def images(self):
+        if not self.options["images"]:
+            return []
+        return [
+            default_storage.save(
+                f"posts/{self.options['prefix']}_{number}.gif",
+                ContentFile(SEED_IMAGE)
+            ) for number in range(10)
+        ]
+
+    def text(self, words):
+        return " ".join(self.random.choices(WORDS, k=words))
+
+    def create_posts(self, user_ids, group_ids):
+        total = self.options["posts"]
+        if not total or not user_ids:
+            return
+        rnd = self.random
+        adapt = connection.ops.adapt_datetimefield_value
+        alpha = self.options["alpha"]
+        author_weights = power_law_weights(len(user_ids), alpha)
+        group_weights = power_law_weights(len(group_ids), alpha)
+        images = self.images()
+        texts = [self.text(rnd.randint(5, 60)) for _ in range(1000)]
+        first_pk = (Post.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+        comment_pk = (
+            Comment.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+        span = timedelta(days=self.options["days"])
+        # Наивное время в UTC адаптируется для БД без перевода поясов.
+        start = timezone.now().replace(tzinfo=None) - span
+        batch = self.options["batch_size"]
+        for offset in range(0, total, batch):
+            size = min(batch, total - offset)
+            authors = rnd.choices(user_ids, cum_weights=author_weights, k=size)
+            groups = (rnd.choices(group_ids, cum_weights=group_weights, k=size)
+                      if group_ids else [None] * size)
+            for index in range(size):
+                number = offset + index
+                created = start + span * (number / total)
+                # В схеме колонка image NOT NULL: пустая строка — нет картинки.
+                image = ""
+                if images and rnd.random() < self.options["images"]:
+                    image = rnd.choice(images)
+                group_id = groups[index]
+                if rnd.random() < self.options["no_group"]:
+                    group_id = None
+                self.rows.add(Post, (
+                    first_pk + number, authors[index], group_id,
+                    rnd.choice(texts), image, adapt(created), adapt(created)
+                ))
+                comments = self.comment_count()
+                if not comments:
+                    continue
+                commenters = rnd.choices(
+                    user_ids, cum_weights=author_weights, k=comments)
+                for author_id in commenters:
+                    self.rows.add(Comment, (
+                        comment_pk, first_pk + number, author_id,
+                        rnd.choice(texts), adapt(created + timedelta(
+                            minutes=rnd.randint(1, 24 * 60)))
+                    ))
+                    comment_pk += 1
+            self.progress("Посты", offset + size)
+
+    def long_tail(self, mean):
+        """Целое с длинным хвостом и средним mean, возможен и 0."""
+        # Парето с alpha=2 начинается с 1 и имеет среднее 2: после
+        # сдвига на 1 среднее равно 1. Случайное округление не
+        # занижает среднее, как отбрасывание дробной части.
+        return int(mean * (self.random.paretovariate(2) - 1)
+                   + self.random.random())
+
+    def comment_count(self):
+        """Число комментариев с длинным хвостом и заданным средним."""
+        mean = self.options["comments"]
+        if mean <= 0:
+            return 0
+        return self.long_tail(mean)
+
+    def create_follows(self, user_ids):
+        mean = self.options["follows"]
+        if mean <= 0 or len(user_ids) < 2:
+            return
+        weights = power_law_weights(len(user_ids), self.options["alpha"])
+        for user_id in user_ids:
+            count = min(self.long_tail(mean), len(user_ids) - 1)
+            authors = set(self.random.choices(
+                user_ids, cum_weights=weights, k=count))
+            authors.discard(user_id)
+            for author_id in authors:
+                self.rows.add(Follow, (user_id, author_id))
+        self.progress("Подписки", len(user_ids))
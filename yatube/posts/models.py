@@ -1,9 +1,16 @@
 from core.models import CreatedModel
+from core.query_budget import unbudgeted
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
 
 User = get_user_model()
 
+# Две переменные на пару в DELETE укладываются в лимит SQLite (999).
+FOLLOW_BATCH_SIZE = 400
+# Каждый TICKET_PRUNE_EVERY-й выданный id удаляет строки Ticket до себя.
+TICKET_PRUNE_EVERY = 1000
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -14,21 +21,87 @@ class Group(models.Model):
         return self.title
 
 
-class Post(CreatedModel):
+class TicketManager(models.Manager):
+    def reserve(self, top):
+        """Следующие выданные id будут больше top."""
+        if top and not self.filter(pk__gte=top).exists():
+            # Автоинкремент SQLite продолжит нумерацию после top.
+            self.bulk_create([self.model(pk=top)], ignore_conflicts=True)
+
+    def issue(self):
+        """Новый id. Первым выдаётся id после тех, что до включения
+        шардов выдал автоинкремент default (и архива).
+        """
+        if not self.exists():
+            aliases = ["default", settings.ARCHIVE_DATABASE]
+            with unbudgeted():
+                self.reserve(max(
+                    model.objects.using(alias).aggregate(
+                        top=models.Max("pk"))["top"] or 0
+                    for model in (Post, Comment) for alias in aliases
+                    if alias
+                ))
+        pk = self.create().pk
+        if pk % TICKET_PRUNE_EVERY == 0:
+            # AUTOINCREMENT не выдаёт повторно id удалённых строк.
+            self.filter(pk__lt=pk).delete()
+        return pk
+
+
+class Ticket(models.Model):
+    """Выдаёт id постам и комментариям, когда они лежат в нескольких
+    базах: автоинкремент каждого шарда выдал бы одинаковые id.
+    """
+    objects = TicketManager()
+
+
+class ShardedQuerySet(models.QuerySet):
+    def create(self, **kwargs):
+        """Без using() пишет туда же, куда save(): в базу, которую роутер
+        выбирает по объекту, а не в default.
+        """
+        if self._db is not None:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True)
+        return obj
+
+
+class ShardedModel(CreatedModel):
+    """Абстрактная модель, которая может лежать в шарде автора."""
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self.pk is None and settings.DATABASE_SHARDS:
+            self.pk = Ticket.objects.issue()
+            kwargs["force_insert"] = True
+        super().save(*args, **kwargs)
+
+
+class Post(ShardedModel):
     text = models.TextField(
         "Текст поста",
         help_text="Текст нового поста",
     )
+    # Пользователи и группы остаются в default, а пост может лежать в
+    # шарде или архиве: ограничение внешнего ключа в другой базе не
+    # проверить. Миграция 0022 снимает его только там, в default оно
+    # остаётся.
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        verbose_name="Автор"
+        verbose_name="Автор",
+        db_constraint=False
     )
     group = models.ForeignKey(
         Group,
         on_delete=models.SET_NULL,
         blank=True,
         null=True,
+        db_constraint=False,
         verbose_name="Группа",
         help_text="Группа, к которой будет относиться пост",
     )
@@ -39,16 +112,32 @@ class Post(CreatedModel):
         null=True,
         help_text="Картинка, которая хорошо дополнит тест"
     )
+    updated = models.DateTimeField(
+        "Дата изменения",
+        auto_now=True,
+        db_index=True
+    )
 
     class Meta():
         default_related_name = "posts"
         ordering = ("-created",)
+        indexes = [
+            models.Index(fields=["created"], name="post_created_idx"),
+            models.Index(
+                fields=["author", "created"],
+                name="post_author_created_idx"
+            ),
+            models.Index(
+                fields=["group", "created"],
+                name="post_group_created_idx"
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
 
 
-class Comment(CreatedModel):
+class Comment(ShardedModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -57,7 +146,8 @@ class Comment(CreatedModel):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        verbose_name="Автор"
+        verbose_name="Автор",
+        db_constraint=False
     )
     text = models.TextField(
         "Текст комментария"
@@ -67,6 +157,43 @@ class Comment(CreatedModel):
         default_related_name = "comments"
 
 
+class FollowManager(models.Manager):
+    def follow_pairs(self, pairs):
+        """Создаёт подписки (user_id, author_id) многострочными INSERT,
+        пропуская уже существующие и подписки на самого себя.
+        """
+        follows = [
+            self.model(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs
+            if user_id != author_id
+        ]
+        self.bulk_create(follows, ignore_conflicts=True)
+
+    def unfollow_pairs(self, pairs, batch_size=FOLLOW_BATCH_SIZE):
+        """Удаляет подписки (user_id, author_id) пачками по batch_size."""
+        pairs = list(pairs)
+        deleted = 0
+        for start in range(0, len(pairs), batch_size):
+            condition = models.Q()
+            for user_id, author_id in pairs[start:start + batch_size]:
+                condition |= models.Q(user_id=user_id, author_id=author_id)
+            deleted += self.filter(condition).delete()[0]
+        return deleted
+
+    def follow(self, user, author_ids):
+        self.follow_pairs((user.pk, author_id) for author_id in author_ids)
+
+    def unfollow(self, user, author_ids, batch_size=FOLLOW_BATCH_SIZE):
+        author_ids = list(author_ids)
+        deleted = 0
+        for start in range(0, len(author_ids), batch_size):
+            deleted += self.filter(
+                user=user,
+                author_id__in=author_ids[start:start + batch_size]
+            ).delete()[0]
+        return deleted
+
+
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
@@ -81,6 +208,8 @@ class Follow(models.Model):
         related_name="following"
     )
 
+    objects = FollowManager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -88,3 +217,37 @@ class Follow(models.Model):
                 name="unique_follow"
             )
         ]
+
+
+class GroupSubscription(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+        related_name="group_subscriptions"
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        verbose_name="Группа",
+        related_name="subscribers"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "group"],
+                name="unique_group_subscription"
+            )
+        ]
+
+
+class AuthorShard(models.Model):
+    """Шард автора, выбранный вместо шарда по хешу (reshard_posts)."""
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="post_shard"
+    )
+    database = models.CharField("Алиас базы", max_length=100)
@@ -0,0 +1,232 @@
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connections, transaction
+from django.db.models import prefetch_related_objects
+from django.http import Http404
+
+from .models import AuthorShard, Comment, Post, User
+
+AUTHOR_SHARD_TIMEOUT = 60 * 60
+SHARDED_MODELS = (Post, Comment)
+
+
+def is_sharded():
+    return bool(settings.DATABASE_SHARDS)
+
+
+def shard_aliases():
+    """Базы с постами. Без шардов — [None]: базу выбирают роутеры, и
+    чтения лент могут уйти на реплику.
+    """
+    return settings.DATABASE_SHARDS or [None]
+
+
+def hash_shard(author_id):
+    shards = settings.DATABASE_SHARDS
+    return shards[zlib.crc32(str(author_id).encode()) % len(shards)]
+
+
+def author_shard_key(author_id):
+    return f"author_shard.{author_id}"
+
+
+def shard_for(author_id):
+    """База постов автора: из AuthorShard, если автора переносили, иначе
+    по хешу id. Без шардов — None.
+    """
+    if not is_sharded():
+        return None
+    key = author_shard_key(author_id)
+    alias = cache.get(key)
+    if alias is None:
+        alias = AuthorShard.objects.filter(
+            author_id=author_id).values_list("database", flat=True).first()
+        alias = alias or hash_shard(author_id)
+        cache.set(key, alias, AUTHOR_SHARD_TIMEOUT)
+    return alias
+
+
+def author_posts(author_id):
+    return Post.objects.using(shard_for(author_id)).filter(
+        author_id=author_id)
+
+
+def author_history(author_id):
+    """Посты автора: в его базе и, если он есть, в архиве."""
+    querysets = [author_posts(author_id)]
+    if settings.ARCHIVE_DATABASE:
+        querysets.append(Post.objects.using(
+            settings.ARCHIVE_DATABASE).filter(author_id=author_id))
+    return querysets
+
+
+def scatter(queryset, archive=False):
+    """queryset на каждой базе с постами, с archive=True — и в архиве."""
+    aliases = shard_aliases()
+    if archive and settings.ARCHIVE_DATABASE:
+        aliases = [*aliases, settings.ARCHIVE_DATABASE]
+    return [queryset.using(alias) for alias in aliases]
+
+
+def outside_default(alias):
+    """Посты в базе alias ссылаются на пользователей и группы из
+    default, JOIN с ними там невозможен.
+    """
+    return alias is not None and (alias in settings.DATABASE_SHARDS
+                                  or alias == settings.ARCHIVE_DATABASE)
+
+
+def with_relations(queryset, *fields):
+    """select_related(*fields), если queryset читает default или
+    реплику; иначе связи подгружает attach_relations.
+    """
+    if outside_default(queryset.db):
+        return queryset
+    return queryset.select_related(*fields)
+
+
+def attach_relations(objects, *fields):
+    prefetch_related_objects(
+        [obj for obj in objects if outside_default(obj._state.db)], *fields)
+    return objects
+
+
+def find_post(post_id):
+    """Пост с id из той базы, где он лежит, или None. Архив читается
+    последним.
+    """
+    for posts in scatter(Post.objects.filter(pk=post_id), archive=True):
+        post = posts.first()
+        if post is not None:
+            return post
+    return None
+
+
+def request_post(request, post_id):
+    """find_post один раз на запрос: пост нужен и состоянию страницы, и
+    представлению, и фрагменту.
+    """
+    if not hasattr(request, "_posts"):
+        request._posts = {}
+    post_id = int(post_id)
+    if post_id not in request._posts:
+        request._posts[post_id] = find_post(post_id)
+    return request._posts[post_id]
+
+
+def get_post_or_404(request, post_id):
+    post = request_post(request, post_id)
+    if post is None:
+        raise Http404("No Post matches the given query.")
+    return post
+
+
+def count_author_posts(author_id):
+    return sum(posts.count() for posts in author_history(author_id))
+
+
+def insert_rows(model, objects, target):
+    """bulk_create без pre_save: created и updated (auto_now) копируются
+    как есть. Уже вставленные строки пропускаются.
+    """
+    fields = model._meta.concrete_fields
+    size = max(connections[target].ops.bulk_batch_size(fields, objects), 1)
+    queryset = model.objects.using(target)
+    for start in range(0, len(objects), size):
+        queryset._insert(objects[start:start + size], fields, raw=True,
+                         ignore_conflicts=True)
+
+
+def move_posts(posts, target, batch_size):
+    """Переносит посты queryset posts вместе с комментариями в базу
+    target пачками и возвращает их число.
+
+    Сначала вставка в target, потом удаление из базы posts: между ними
+    пост есть в обеих базах, и merge_streams отбрасывает повтор.
+    Прерванный перенос можно запустить заново. id постов сохраняются.
+    """
+    source = posts.db
+    posts = posts.order_by("pk")
+    moved = 0
+    while True:
+        batch = list(posts[:batch_size])
+        if not batch:
+            return moved
+        ids = [post.pk for post in batch]
+        copied = dict(Post.objects.using(target).filter(
+            pk__in=ids).values_list("pk", "author_id"))
+        for post in batch:
+            if copied.get(post.pk, post.author_id) != post.author_id:
+                raise IntegrityError(
+                    f"Пост {post.pk} из {source} совпадает по id с постом "
+                    f"в {target}."
+                )
+        comments = Comment.objects.using(source).filter(post_id__in=ids)
+        with transaction.atomic(using=target):
+            # Уже скопированное прерванным переносом пропускается.
+            insert_rows(Post, batch, target)
+            insert_rows(Comment, list(comments), target)
+        # Без сигналов и каскада: посты не удаляются, а переезжают.
+        with transaction.atomic(using=source):
+            comments._raw_delete(source)
+            posts.filter(pk__in=ids)._raw_delete(source)
+        moved += len(batch)
+
+
+def posts_by_ids(ids):
+    """Посты с автором и группой со всех баз в порядке ids."""
+    found = {}
+    posts = with_relations(Post.objects.filter(pk__in=ids), "author", "group")
+    for shard_posts in scatter(posts):
+        found.update((post.pk, post) for post in shard_posts)
+    return attach_relations(
+        [found[pk] for pk in ids if pk in found], "author", "group")
+
+
+def is_archived(post):
+    return (settings.ARCHIVE_DATABASE is not None
+            and post._state.db == settings.ARCHIVE_DATABASE)
+
+
+class ShardRouter:
+    """Посты и комментарии автора лежат в его шарде (shard_for), а
+    архивные — в архиве вместе со своими комментариями.
+
+    Запросы без подсказки-объекта роутер не решает: ленты по всем
+    шардам читаются через scatter. Без шардов и архива роутер ничего не
+    решает вовсе.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model not in SHARDED_MODELS:
+            return None
+        instance = hints.get("instance")
+        if isinstance(instance, SHARDED_MODELS) and (
+                is_sharded() or is_archived(instance)):
+            return instance._state.db
+        if is_sharded() and isinstance(instance, User) and model is Post:
+            return shard_for(instance.pk)
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model not in SHARDED_MODELS:
+            return None
+        instance = hints.get("instance")
+        post = instance.post if isinstance(instance, Comment) else instance
+        # Правки архивного поста и комментарии к нему остаются в архиве.
+        if isinstance(post, Post) and is_archived(post):
+            return post._state.db
+        if not is_sharded():
+            return None
+        if isinstance(instance, Post):
+            return shard_for(instance.author_id)
+        if isinstance(instance, Comment):
+            # Комментарий пишется к посту, даже если автора поста как раз
+            # переносят в другой шард: пост переедет вместе с ним.
+            return instance.post._state.db or shard_for(
+                instance.post.author_id)
+        if isinstance(instance, User) and model is Post:
+            return shard_for(instance.pk)
+        return None
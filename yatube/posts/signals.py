@@ -0,0 +1,42 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .follow_cache import invalidate_author_feeds, invalidate_follow_feed
+from .models import Comment, Follow, Group, Post, User
+from .shards import outside_default, scatter
+
+
+@receiver((post_save, post_delete), sender=Post)
+def post_changed(sender, instance, **kwargs):
+    """Пост автора меняет ленты всех его подписчиков."""
+    invalidate_author_feeds([instance.author_id])
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    invalidate_follow_feed([instance.user_id])
+
+
+@receiver(pre_delete, sender=User)
+def author_deleted(sender, instance, **kwargs):
+    """Каскад Django удаляет только объекты из базы пользователя: посты и
+    комментарии в шардах и архиве удаляются отдельно.
+    """
+    posts = Post.objects.filter(author_id=instance.pk)
+    comments = Comment.objects.filter(author_id=instance.pk)
+    for posts, comments in zip(scatter(posts, archive=True),
+                               scatter(comments, archive=True)):
+        if outside_default(posts.db):
+            posts.delete()
+            comments.delete()
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    """SET_NULL Django обновляет только посты в базе группы: в шардах и
+    архиве ссылка на группу снимается отдельно.
+    """
+    for posts in scatter(Post.objects.filter(group_id=instance.pk),
+                         archive=True):
+        if outside_default(posts.db):
+            posts.update(group=None)
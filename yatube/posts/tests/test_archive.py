@@ -0,0 +1,91 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from posts.models import Comment, Post, User
+
+ARCHIVE = "archive"
+
+
+def add_archive_database():
+    """Архив в памяти для тестов: в settings его нет, пока SQLITE_ARCHIVE
+    выключен.
+    """
+    if ARCHIVE not in connections.databases:
+        connections.databases[ARCHIVE] = {
+            "ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
+        with override_settings(ARCHIVE_DATABASE=ARCHIVE):
+            call_command("migrate", database=ARCHIVE, verbosity=0)
+
+
+@override_settings(ARCHIVE_DATABASE=ARCHIVE)
+class ArchiveTests(TransactionTestCase):
+    databases = {"default", ARCHIVE}
+
+    @classmethod
+    def setUpClass(cls):
+        add_archive_database()
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author")
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.old = Post.objects.create(text="Старый", author=self.author)
+        Comment.objects.create(
+            post=self.old, author=self.author, text="Комментарий")
+        Post.objects.filter(pk=self.old.pk).update(
+            created=timezone.now() - timedelta(days=400))
+        self.new = Post.objects.create(text="Новый", author=self.author)
+        call_command("archive_posts", "--days", "365", "--batch-size", "1",
+                     stdout=StringIO())
+
+    def test_old_posts_moved_with_comments(self):
+        """archive_posts переносит старые посты с комментариями и
+        сохраняет их id.
+        """
+        self.assertEqual(list(Post.objects.using("default").values_list(
+            "pk", flat=True)), [self.new.pk])
+        self.assertFalse(Comment.objects.using("default").exists())
+        self.assertEqual(
+            Comment.objects.using(ARCHIVE).get().post_id, self.old.pk)
+        # Время создания не перезаписывается при переносе.
+        self.assertLess(Post.objects.using(ARCHIVE).get().created,
+                        timezone.now() - timedelta(days=365))
+
+    def test_author_pages_read_archive(self):
+        """Профиль и страница поста читают архив, главная — нет."""
+        page = self.client.get(reverse(
+            "posts:profile", args=(self.author.username,))).context[
+                "page_obj"]
+        self.assertEqual(page.paginator.count, 2)
+        self.assertEqual([post.text for post in page], ["Новый", "Старый"])
+        self.assertEqual(page[1].author, self.author)
+        self.client.post(reverse("posts:add_comment", args=(self.old.pk,)),
+                         {"text": "Ещё"})
+        response = self.client.get(
+            reverse("posts:post_detail", args=(self.old.pk,)))
+        self.assertEqual(response.context["post"].text, "Старый")
+        self.assertEqual(len(response.context["comments"]), 2)
+        self.assertEqual(response.context["author_posts_count"], 2)
+        self.assertEqual(Comment.objects.using(ARCHIVE).count(), 2)
+        page = self.client.get(reverse("posts:index")).context["page_obj"]
+        self.assertEqual([post.text for post in page], ["Новый"])
+
+    def test_archived_post_edited_in_archive(self):
+        self.client.post(reverse("posts:post_edit", args=(self.old.pk,)),
+                         {"text": "Исправленный"})
+        self.assertEqual(Post.objects.using(ARCHIVE).get().text,
+                         "Исправленный")
+        self.assertEqual(Post.objects.using("default").count(), 1)
+
+    def test_deleted_author_posts_removed_from_archive(self):
+        self.author.delete()
+        self.assertFalse(Post.objects.using(ARCHIVE).exists())
+        self.assertFalse(Comment.objects.using(ARCHIVE).exists())
@@ -0,0 +1,318 @@
+import json
+import os
+import random
+import sqlite3
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase
+from posts.benchmarks import (SQLITE_BASELINE_PRAGMAS, copy_database,
+                              run_sqlite)
+from posts.management.commands.seed_yatube import Command as SeedCommand
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def write_temp_file(content, suffix=".csv"):
+    handle, path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(handle, "w", encoding="utf-8") as temp_file:
+        temp_file.write(content)
+    return path
+
+
+class BulkFollowCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="user")
+        cls.auth = User.objects.create_user(username="auth")
+        cls.other = User.objects.create_user(username="other")
+
+    def test_bulk_follow_and_unfollow(self):
+        """Команда bulk_follow создаёт и удаляет подписки из CSV."""
+        path = write_temp_file(
+            "user,auth\nuser,other\nuser,user\nuser,nobody\n")
+        self.addCleanup(os.remove, path)
+        call_command("bulk_follow", path, stdout=StringIO())
+        call_command("bulk_follow", path, stdout=StringIO())
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 2)
+
+        call_command("bulk_follow", path, "--unfollow", stdout=StringIO())
+        self.assertFalse(Follow.objects.exists())
+
+
+class ImportCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(username="auth")
+
+    def import_file(self, content, suffix, *args):
+        path = write_temp_file(content, suffix)
+        self.addCleanup(os.remove, path)
+        out = StringIO()
+        call_command(
+            "import_yatube", path, "--batch-size", "2", *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_jsonl(self):
+        """import_yatube создаёт связанные записи из JSONL."""
+        records = [
+            {"type": "group", "slug": "imported", "title": "Импорт"},
+            {"type": "user", "username": "reader"},
+            {"type": "post", "id": 100, "author": "auth",
+             "group": "imported", "text": "Старый пост",
+             "created": "2015-03-01T10:00:00+00:00"},
+            {"type": "comment", "id": 200, "post": 100, "author": "reader",
+             "text": "Комментарий"},
+            {"type": "follow", "user": "reader", "author": "auth"},
+            {"type": "post", "author": "nobody", "text": "Пропущен"},
+        ]
+        content = "\n".join(json.dumps(record) for record in records)
+        self.import_file(content, ".jsonl")
+        self.import_file(content, ".jsonl")
+
+        post = Post.objects.get()
+        self.assertEqual(post.pk, 100)
+        self.assertEqual(post.group, Group.objects.get(slug="imported"))
+        self.assertEqual(post.created.year, 2015)
+        self.assertEqual(Comment.objects.get().author.username, "reader")
+        self.assertTrue(Follow.objects.filter(
+            user__username="reader", author=self.auth).exists())
+
+    def test_colliding_ids_and_orphans_skipped(self):
+        """Пост с занятым id, комментарии к нему и к несуществующему
+        посту пропускаются и не попадают в счётчик записанных.
+        """
+        Post.objects.create(pk=100, author=self.auth, text="Чужой пост")
+        records = [
+            {"type": "post", "id": 100, "author": "auth", "text": "Дубль"},
+            {"type": "comment", "post": 100, "author": "auth",
+             "text": "Не к тому посту"},
+            {"type": "comment", "post": 999, "author": "auth",
+             "text": "Без поста"},
+            {"type": "post", "id": 101, "author": "auth", "text": "Новый"},
+            {"type": "comment", "post": 101, "author": "auth",
+             "text": "К новому посту"},
+        ]
+        out = self.import_file(
+            "\n".join(json.dumps(record) for record in records), ".jsonl")
+
+        self.assertEqual(Post.objects.get(pk=100).text, "Чужой пост")
+        self.assertEqual(Comment.objects.get().post_id, 101)
+        self.assertIn("post: 1, comment: 1; пропущено: 3", out)
+
+    def test_images_outside_image_root_skipped(self):
+        """Пути картинок вне --image-root не копируются в MEDIA."""
+        with tempfile.TemporaryDirectory() as media_root, \
+                tempfile.TemporaryDirectory() as image_root:
+            secret = write_temp_file("секрет", ".png")
+            self.addCleanup(os.remove, secret)
+            with open(os.path.join(image_root, "ok.png"), "wb") as image:
+                image.write(b"png")
+            records = [
+                {"type": "post", "id": 1, "author": "auth", "text": "Выход",
+                 "image": os.path.relpath(secret, image_root)},
+                {"type": "post", "id": 2, "author": "auth",
+                 "text": "Абсолютный", "image": secret},
+                {"type": "post", "id": 3, "author": "auth", "text": "Внутри",
+                 "image": "ok.png"},
+            ]
+            path = write_temp_file(
+                "\n".join(json.dumps(record) for record in records),
+                ".jsonl")
+            self.addCleanup(os.remove, path)
+            errors = StringIO()
+            with self.settings(MEDIA_ROOT=media_root):
+                call_command("import_yatube", path, "--image-root",
+                             image_root, stdout=StringIO(), stderr=errors)
+            self.assertEqual(
+                dict(Post.objects.values_list("pk", "image")),
+                {1: "", 2: "", 3: "posts/ok.png"})
+            self.assertEqual(os.listdir(os.path.join(media_root, "posts")),
+                             ["ok.png"])
+            self.assertEqual(errors.getvalue().count("вне --image-root"), 2)
+
+    def test_import_csv(self):
+        self.import_file(
+            "author,text\nauth,Первый\nauth,Второй\nauth,Третий\n",
+            ".csv", "--type", "post"
+        )
+        self.assertEqual(self.auth.posts.count(), 3)
+
+
+class ExportCommandTests(TestCase):
+    def test_export_round_trips_through_import(self):
+        """Выгрузка export_yatube читается командой import_yatube."""
+        auth = User.objects.create_user(username="auth")
+        Post.objects.create(author=auth, text="Тестовый пост")
+        handle, path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command("export_yatube", "auth", "--output", path)
+        Post.objects.all().delete()
+
+        call_command("import_yatube", path, stdout=StringIO())
+        self.assertEqual(auth.posts.get().text, "Тестовый пост")
+
+
+class SeedCommandTests(TestCase):
+    def test_seed_creates_skewed_dataset(self):
+        """seed_yatube создаёт данные со степенным распределением."""
+        call_command(
+            "seed_yatube", "--users", "20", "--groups", "3",
+            "--posts", "500", "--comments", "1", "--follows", "4",
+            "--batch-size", "100", "--seed", "1", stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 500)
+        self.assertTrue(Comment.objects.exists())
+        self.assertTrue(Follow.objects.exists())
+        top_author = User.objects.get(username="seed_user_0")
+        last_author = User.objects.get(username="seed_user_19")
+        self.assertGreater(
+            top_author.posts.count(), last_author.posts.count())
+
+    def test_long_tail_keeps_requested_mean(self):
+        """Длинный хвост seed_yatube даёт заданное среднее и нули."""
+        command = SeedCommand()
+        command.random = random.Random(1)
+        counts = [command.long_tail(5) for _ in range(20000)]
+        self.assertAlmostEqual(sum(counts) / len(counts), 5, delta=0.25)
+        self.assertIn(0, counts)
+
+
+class BenchCommandTests(TestCase):
+    def test_bench_reports_and_detects_regressions(self):
+        """bench_yatube сохраняет замеры и сравнивает их с базовыми."""
+        call_command(
+            "seed_yatube", "--users", "5", "--groups", "2", "--posts", "30",
+            "--seed", "1", stdout=StringIO()
+        )
+        handle, path = tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command(
+            "bench_yatube", "--repeat", "1", "--output", path,
+            stdout=StringIO()
+        )
+        with open(path, encoding="utf-8") as report_file:
+            report = json.load(report_file)
+        self.assertIn("posts:index[deep]", report["results"])
+        self.assertIn("posts:add_comment", report["results"])
+        self.assertEqual(Comment.objects.filter(text="Замер").count(), 0)
+
+        for result in report["results"].values():
+            result["queries"] = 0
+        with open(path, "w", encoding="utf-8") as report_file:
+            json.dump(report, report_file)
+        with self.assertRaises(CommandError):
+            call_command(
+                "bench_yatube", "--repeat", "1", "--baseline", path,
+                "--only", "posts:index", stdout=StringIO()
+            )
+
+    def test_bench_cache_mode_reported(self):
+        """bench_yatube пишет режим кеша в вывод и JSON и не сравнивает
+        замеры с разным режимом."""
+        call_command(
+            "seed_yatube", "--users", "3", "--groups", "1", "--posts", "5",
+            "--seed", "1", stdout=StringIO()
+        )
+        handle, path = tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        out = StringIO()
+        call_command(
+            "bench_yatube", "--repeat", "1", "--cold-cache", "--only",
+            "posts:index", "--output", path, stdout=out
+        )
+        self.assertIn("Кеш: cold", out.getvalue())
+        with open(path, encoding="utf-8") as report_file:
+            report = json.load(report_file)
+        self.assertEqual(report["meta"]["cache"], "cold")
+        self.assertEqual(
+            report["results"]["posts:index[shallow]"]["queries_by_db"],
+            {"default": report["results"]["posts:index[shallow]"]["queries"]})
+        with self.assertRaisesRegex(CommandError, "cold"):
+            call_command(
+                "bench_yatube", "--repeat", "1", "--baseline", path,
+                "--only", "posts:index", stdout=StringIO()
+            )
+
+    def test_bench_templates(self):
+        """bench_yatube --templates сравнивает рендеринг с кешем и без."""
+        call_command(
+            "seed_yatube", "--users", "3", "--groups", "1", "--posts", "5",
+            "--no-group", "0", "--seed", "1", stdout=StringIO()
+        )
+        output = StringIO()
+        call_command(
+            "bench_yatube", "--templates", "--repeat", "1", stdout=output)
+        self.assertIn("posts/group_list.html", output.getvalue())
+
+
+class BenchSqliteCommandTests(TransactionTestCase):
+    # Копия базы через backup ждёт конца транзакции, которую держит
+    # TestCase.
+    def test_bench_sqlite(self):
+        """bench_yatube --sqlite сравнивает профили SQLite в потоках."""
+        call_command(
+            "seed_yatube", "--users", "3", "--groups", "2", "--posts", "20",
+            "--seed", "1", stdout=StringIO()
+        )
+        output = StringIO()
+        call_command(
+            "bench_yatube", "--sqlite", "--readers", "2", "--writers", "1",
+            "--seconds", "0.5", stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith("default"))
+        self.assertTrue(lines[1].startswith("production"))
+        self.assertTrue(all(line.endswith("ошибок 0") for line in lines))
+
+    def test_bench_replicas(self):
+        """bench_yatube --replicas сравнивает чтение с основной базы и с
+        реплик.
+        """
+        call_command(
+            "seed_yatube", "--users", "3", "--groups", "2", "--posts", "20",
+            "--seed", "1", stdout=StringIO()
+        )
+        output = StringIO()
+        call_command(
+            "bench_yatube", "--replicas", "2", "--readers", "2",
+            "--writers", "1", "--seconds", "0.5", stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith("primary"))
+        self.assertTrue(lines[1].startswith("replicas"))
+        self.assertTrue(all(line.endswith("ошибок 0") for line in lines))
+
+    def test_copies_get_profile_journal_mode(self):
+        """Копия профиля "default" не наследует WAL исходной базы."""
+        with tempfile.TemporaryDirectory() as directory:
+            modes = {}
+            for name, pragmas in (
+                    ("production", settings.SQLITE_PRODUCTION_PRAGMAS),
+                    ("default", SQLITE_BASELINE_PRAGMAS)):
+                db = sqlite3.connect(
+                    copy_database(directory, name, pragmas))
+                modes[name] = db.execute("PRAGMA journal_mode").fetchone()[0]
+                db.close()
+        self.assertEqual(modes, {"production": "wal", "default": "delete"})
+
+    def test_bench_sqlite_without_groups(self):
+        call_command(
+            "seed_yatube", "--users", "2", "--groups", "0", "--posts", "5",
+            "--seed", "1", stdout=StringIO()
+        )
+        results = run_sqlite(1, 1, 0.2)
+        # В режиме DELETE писатель может занять базу на весь замер, в WAL
+        # читатель не ждёт писателя.
+        self.assertGreater(results["production"]["reads_per_s"], 0)
+        for result in results.values():
+            self.assertGreater(result["writes_per_s"], 0)
@@ -0,0 +1,250 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from posts.benchmarks import Scenario, measure
+from posts.models import (TICKET_PRUNE_EVERY, AuthorShard, Comment, Follow,
+                          Group, Post, Ticket, User)
+from posts.shards import hash_shard, move_posts
+
+SHARDS = ["shard-a", "shard-b"]
+
+
+def add_shard_databases():
+    """Шарды в памяти для тестов: в settings их нет, пока SQLITE_SHARDS
+    равен нулю.
+    """
+    for alias in SHARDS:
+        if alias not in connections.databases:
+            connections.databases[alias] = {
+                "ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
+            with override_settings(DATABASE_SHARDS=SHARDS):
+                call_command("migrate", database=alias, verbosity=0)
+
+
+@override_settings(DATABASE_SHARDS=SHARDS)
+class ShardTests(TransactionTestCase):
+    databases = {"default", *SHARDS}
+
+    @classmethod
+    def setUpClass(cls):
+        add_shard_databases()
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание")
+        # Два автора с разными шардами по хешу.
+        self.authors = {}
+        number = 0
+        while len(self.authors) < 2:
+            user = User.objects.create_user(username=f"author{number}")
+            self.authors.setdefault(hash_shard(user.pk), user)
+            number += 1
+        self.client = Client()
+        for alias, author in sorted(self.authors.items()):
+            self.client.force_login(author)
+            for text in ("Первый", "Второй"):
+                self.client.post(reverse("posts:post_create"), {
+                    "text": f"{text} {alias}", "group": self.group.pk})
+
+    def test_posts_stored_in_author_shard(self):
+        """Посты автора пишутся в его шард с id из общего счётчика."""
+        self.assertFalse(Post.objects.using("default").exists())
+        ids = []
+        for alias, author in self.authors.items():
+            posts = Post.objects.using(alias).filter(author=author)
+            self.assertEqual(posts.count(), 2)
+            ids += posts.values_list("pk", flat=True)
+        self.assertEqual(len(set(ids)), 4)
+
+    def test_bench_measures_and_rolls_back_shards(self):
+        """Замер считает запросы к шардам и откатывает записи в них."""
+        author = self.authors["shard-a"]
+        self.client.force_login(author)
+        scenario = Scenario("posts:post_create[submit]", "post",
+                            reverse("posts:post_create"), {"text": "Замер"},
+                            author, True)
+        result = measure(self.client, scenario)
+        self.assertGreater(result["queries_by_db"]["shard-a"], 0)
+        self.assertEqual(result["queries"],
+                         sum(result["queries_by_db"].values()))
+        self.assertFalse(
+            Post.objects.using("shard-a").filter(text="Замер").exists())
+
+    def test_feeds_merge_shards(self):
+        """Главная и группа сливают шарды по времени создания."""
+        for url in (reverse("posts:index"),
+                    reverse("posts:group_list", args=("group",))):
+            page = self.client.get(url).context["page_obj"]
+            self.assertEqual(page.paginator.count, 4)
+            self.assertEqual(
+                [post.text for post in page],
+                ["Второй shard-b", "Первый shard-b",
+                 "Второй shard-a", "Первый shard-a"])
+            self.assertEqual(page[0].group, self.group)
+
+    def test_follow_feeds_read_shards(self):
+        reader = User.objects.create_user(username="reader")
+        Follow.objects.create(user=reader, author=self.authors["shard-b"])
+        self.client.force_login(reader)
+        page = self.client.get(reverse("posts:follow_index")).context[
+            "page_obj"]
+        self.assertEqual([post.text for post in page],
+                         ["Второй shard-b", "Первый shard-b"])
+        posts = self.client.get(reverse("posts:feed")).context["posts"]
+        self.assertEqual(len(posts), 2)
+
+    def test_author_pages_read_author_shard(self):
+        author = self.authors["shard-a"]
+        post = Post.objects.using("shard-a").filter(author=author).first()
+        response = self.client.get(
+            reverse("posts:profile", args=(author.username,)))
+        self.assertEqual(response.context["page_obj"].paginator.count, 2)
+        self.client.post(
+            reverse("posts:add_comment", args=(post.pk,)),
+            {"text": "Комментарий"})
+        response = self.client.get(
+            reverse("posts:post_detail", args=(post.pk,)))
+        self.assertEqual(response.context["post"], post)
+        self.assertEqual(
+            [comment.text for comment in response.context["comments"]],
+            ["Комментарий"])
+        self.assertTrue(Comment.objects.using("shard-a").exists())
+
+    def test_reshard_moves_author_with_comments(self):
+        """reshard_posts переносит посты с комментариями и запоминает шард
+        автора.
+        """
+        author = self.authors["shard-a"]
+        post = Post.objects.using("shard-a").filter(author=author).first()
+        self.client.post(
+            reverse("posts:add_comment", args=(post.pk,)),
+            {"text": "Комментарий"})
+        call_command("reshard_posts", author.username, "--to", "shard-b",
+                     "--batch-size", "1", stdout=StringIO())
+        self.assertFalse(Post.objects.using("shard-a").exists())
+        self.assertFalse(Comment.objects.using("shard-a").exists())
+        self.assertEqual(
+            Comment.objects.using("shard-b").get().post_id, post.pk)
+        # Время создания не перезаписывается при переносе.
+        self.assertEqual(
+            Post.objects.using("shard-b").get(pk=post.pk).created,
+            post.created)
+        self.assertEqual(AuthorShard.objects.get(author=author).database,
+                         "shard-b")
+        response = self.client.get(
+            reverse("posts:profile", args=(author.username,)))
+        self.assertEqual(response.context["page_obj"].paginator.count, 2)
+        self.assertEqual(
+            self.client.get(reverse("posts:index"))
+            .context["page_obj"].paginator.count, 4)
+
+    def test_reshard_keeps_posts_written_during_move(self):
+        """Посты, записанные во время переноса, не остаются в старом
+        шарде.
+        """
+        author = self.authors["shard-a"]
+        post = Post.objects.using("shard-a").filter(author=author).first()
+        calls = []
+
+        def move_and_write(posts, target, batch_size):
+            moved = move_posts(posts, target, batch_size)
+            if posts.db == "shard-a" and not calls:
+                Post.objects.create(text="Во время переноса", author=author)
+                # Процесс, ещё не увидевший назначение автора.
+                late = Post.objects.using("shard-a").create(
+                    text="Запоздалый", author=author)
+                Comment.objects.using("shard-a").create(
+                    post=late, author=author, text="Комментарий")
+                calls.append(posts.db)
+            return moved
+
+        with mock.patch(
+                "posts.management.commands.reshard_posts.move_posts",
+                move_and_write):
+            call_command("reshard_posts", author.username, "--to",
+                         "shard-b", stdout=StringIO())
+        self.assertFalse(Post.objects.using("shard-a").exists())
+        self.assertFalse(Comment.objects.using("shard-a").exists())
+        self.assertEqual(
+            Post.objects.using("shard-b").filter(author=author).count(), 4)
+        comment = Comment.objects.create(
+            post=Post.objects.using("shard-b").get(pk=post.pk),
+            author=author, text="После")
+        self.assertEqual(comment._state.db, "shard-b")
+
+    def test_rebalance_moves_posts_from_default(self):
+        """--rebalance раскладывает посты, созданные до шардов, и новые id
+        не совпадают со старыми.
+        """
+        author = self.authors["shard-a"]
+        for alias in SHARDS:
+            Post.objects.using(alias).all().delete()
+        with override_settings(DATABASE_SHARDS=[]):
+            old = Post.objects.create(text="До шардов", author=author)
+        call_command("reshard_posts", "--rebalance", stdout=StringIO())
+        self.assertFalse(Post.objects.using("default").exists())
+        self.assertTrue(Post.objects.using("shard-a").filter(
+            pk=old.pk).exists())
+        self.client.force_login(author)
+        self.client.post(reverse("posts:post_create"), {"text": "После"})
+        self.assertGreater(
+            Post.objects.using("shard-a").get(text="После").pk, old.pk)
+
+    def test_deleted_author_posts_removed_from_shard(self):
+        author = self.authors["shard-a"]
+        author.delete()
+        self.assertFalse(Post.objects.using("shard-a").exists())
+
+    def test_first_ticket_follows_default_ids(self):
+        """Первый id после включения шардов больше id постов из default."""
+        author = self.authors["shard-a"]
+        with override_settings(DATABASE_SHARDS=[]):
+            old = Post.objects.create(pk=1000, text="До шардов",
+                                      author=author)
+        Ticket.objects.all().delete()
+        post = Post.objects.create(text="После", author=author)
+        self.assertGreater(post.pk, old.pk)
+
+    def test_tickets_pruned(self):
+        """Таблица Ticket не растёт с каждым постом."""
+        author = self.authors["shard-a"]
+        Ticket.objects.reserve(TICKET_PRUNE_EVERY * 10 - 2)
+        for text in ("Первый", "Второй"):
+            Post.objects.create(text=text, author=author)
+        self.assertEqual(Ticket.objects.count(), 1)
+        post = Post.objects.create(text="Третий", author=author)
+        self.assertEqual(post.pk, TICKET_PRUNE_EVERY * 10 + 1)
+
+    def test_foreign_keys_checked_only_in_default(self):
+        """В default ссылки постов на пользователей и группы проверяет
+        база, в шардах этих таблиц нет.
+        """
+        def references(alias):
+            with connections[alias].cursor() as cursor:
+                cursor.execute("PRAGMA foreign_key_list(posts_post)")
+                return {row[2] for row in cursor.fetchall()}
+
+        self.assertEqual(references("default"), {"auth_user", "posts_group"})
+        for alias in SHARDS:
+            self.assertEqual(references(alias), set())
+
+    def test_create_writes_to_author_shard(self):
+        author = self.authors["shard-b"]
+        post = Post.objects.create(text="Через create", author=author)
+        self.assertTrue(Post.objects.using("shard-b").filter(
+            pk=post.pk).exists())
+        self.assertFalse(Post.objects.using("default").exists())
+
+    def test_deleted_group_unset_in_shards(self):
+        self.group.delete()
+        for alias in SHARDS:
+            self.assertEqual(
+                list(Post.objects.using(alias).values_list(
+                    "group_id", flat=True)), [None, None])
@@ -8,6 +8,16 @@ urlpatterns = [
     path("", views.index, name="index"),
     path("profile/<str:username>/", views.profile, name="profile"),
     path("group/<slug:slug>/", views.group_posts, name="group_list"),
+    path(
+        "group/<slug:slug>/subscribe/",
+        views.group_subscribe,
+        name="group_subscribe"
+    ),
+    path(
+        "group/<slug:slug>/unsubscribe/",
+        views.group_unsubscribe,
+        name="group_unsubscribe"
+    ),
     path("posts/<int:post_id>/", views.post_detail, name="post_detail"),
     path("create/", views.post_create, name="post_create"),
     path("posts/<int:post_id>/edit/", views.post_edit, name="post_edit"),
@@ -16,6 +26,13 @@ urlpatterns = [
         views.add_comment,
         name="add_comment"),
     path("follow/", views.follow_index, name="follow_index"),
+    path("feed/", views.feed, name="feed"),
+    path("follow/bulk/", views.follow_bulk, name="follow_bulk"),
+    path(
+        "profile/<str:username>/export/",
+        views.profile_export,
+        name="profile_export"
+    ),
     path(
         "profile/<str:username>/follow/",
         views.profile_follow,
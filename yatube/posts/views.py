@@ -1,70 +1,131 @@
+from core.compression import compress_page
+from core.query_budget import allow_repeated_queries, query_budget
+from core.replicas import read_replica
+from core.stale import stale_while_revalidate
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.template import engines
+from django.views.decorators.http import require_POST
 
+from .conditions import (cache_by_state, conditional_page, group_state,
+                         index_state, page_count, post_detail_state,
+                         profile_state)
+from .export import EXPORT_FORMATS
+from .feeds import decode_cursor, merged_feed, merged_page
+from .follow_cache import (follow_feed_page, follow_state,
+                           invalidate_follow_feed)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Follow, Group, GroupSubscription, Post, User
+from .shards import (attach_relations, author_history, count_author_posts,
+                     get_post_or_404, scatter, with_relations)
 
 CACHE_TIMEOUT_INDEX = 20
 
 
-def paginate_page(request, posts):
-    paginator = Paginator(posts, settings.COUNT_POSTS)
+def render_feed(request, template_name, context):
+    """render движком, выбранным для маршрута в settings.JINJA2_ROUTES."""
+    using = None
+    view_name = request.resolver_match.view_name
+    if view_name in settings.JINJA2_ROUTES and "jinja2" in engines:
+        using = "jinja2"
+    return render(request, template_name, context, using=using)
+
+
+def paginate_page(request, querysets):
+    """Страница постов с автором и группой; querysets — один набор
+    постов, разложенный по базам (shards.scatter, shards.author_history).
+    """
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    count = page_count(request)
+    if len(querysets) > 1:
+        page = merged_page(
+            querysets, page_number, settings.COUNT_POSTS, count)
+    else:
+        posts, = querysets
+        paginator = Paginator(
+            with_relations(posts, "author", "group"), settings.COUNT_POSTS)
+        if count is not None:
+            paginator.count = count
+        page = paginator.get_page(page_number)
+    page.object_list = attach_relations(
+        list(page.object_list), "author", "group")
+    return page
 
 
-@cache_page(CACHE_TIMEOUT_INDEX, key_prefix='index_page')
+@query_budget(6)
+@read_replica
+@stale_while_revalidate(
+    CACHE_TIMEOUT_INDEX, key_prefix="index_page", vary=("Accept-Encoding",))
+@conditional_page(index_state)
+@compress_page
 def index(request):
-    posts = Post.objects.select_related("author", "group")
     context = {
-        "page_obj": paginate_page(request, posts)
+        "page_obj": paginate_page(request, scatter(Post.objects.all()))
     }
-    return render(request, "posts/index.html", context)
+    return render_feed(request, "posts/index.html", context)
 
 
+@query_budget(8)
+@read_replica
+@conditional_page(group_state)
+@cache_by_state
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related("author", "group")
+    posts = scatter(Post.objects.filter(group=group))
     context = {
         "group": group,
-        "page_obj": paginate_page(request, posts)
+        "page_obj": paginate_page(request, posts),
     }
-    return render(request, "posts/group_list.html", context)
+    return render_feed(request, "posts/group_list.html", context)
 
 
+@query_budget(9)
+@read_replica
+@conditional_page(profile_state)
+@cache_by_state
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related("author", "group")
-    following = (request.user.is_authenticated
-                 and author.following.filter(user=request.user).exists())
     context = {
         "author": author,
-        "page_obj": paginate_page(request, posts),
-        "following": following
+        "page_obj": paginate_page(request, author_history(author.pk)),
     }
-    return render(request, "posts/profile.html", context)
+    return render_feed(request, "posts/profile.html", context)
 
 
+@query_budget(13)
+@read_replica
+@conditional_page(post_detail_state)
+@cache_by_state
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_post_or_404(request, post_id)
     form = CommentForm(request.POST or None)
-    comments = post.comments.select_related("author")
-    if request.method == "POST" and form.is_valid():
-        add_comment(request, post_id=post.pk)
+    if (request.method == "POST" and request.user.is_authenticated
+            and form.is_valid()):
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.post = post
+        comment.save()
+    elif form.is_bound:
+        # Фрагмент формы под постом покажет ошибки и набранный текст.
+        request._comment_form = form
+    comments = attach_relations(
+        list(with_relations(post.comments.all(), "author")), "author")
     context = {
         "post": post,
         "form": form,
-        "comments": comments
+        "comments": comments,
+        "author_posts_count": (page_count(request, 4)
+                               or count_author_posts(post.author_id)),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_post_or_404(request, post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -75,6 +136,7 @@ def add_comment(request, post_id):
 
 
 @login_required
+@query_budget(4)
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -93,8 +155,9 @@ def post_create(request):
 
 
 @login_required
+@query_budget(6)
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_post_or_404(request, post_id)
     if post.author != request.user:
         return redirect('posts:post_detail', post_id=post_id)
 
@@ -115,24 +178,33 @@ def post_edit(request, post_id):
 
 
 @login_required
+@query_budget(6)
+@conditional_page(follow_state)
 def follow_index(request):
-    posts = Post.objects.select_related(
-        "author", "group").filter(author__following__user=request.user)
     context = {
-        "page_obj": paginate_page(request, posts),
+        "page_obj": follow_feed_page(request),
     }
-    return render(request, 'posts/follow.html', context)
+    return render_feed(request, "posts/follow.html", context)
+
+
+@login_required
+def profile_export(request, username):
+    if request.user.username != username:
+        return redirect("posts:profile", username)
+    export, content_type, extension = EXPORT_FORMATS.get(
+        request.GET.get("format"), EXPORT_FORMATS["ndjson"])
+    response = StreamingHttpResponse(
+        export(request.user), content_type=content_type)
+    response["Content-Disposition"] = (
+        f'attachment; filename="{username}.{extension}"')
+    return response
 
 
 @login_required
 def profile_follow(request, username):
-    user = request.user
     author = get_object_or_404(User, username=username)
-    if user != author:
-        Follow.objects.get_or_create(
-            user=user,
-            author=author
-        )
+    Follow.objects.follow(request.user, [author.pk])
+    invalidate_follow_feed([request.user.pk])
     return redirect("posts:follow_index")
 
 
@@ -140,4 +212,53 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     author.following.filter(user=request.user).delete()
+    invalidate_follow_feed([request.user.pk])
+    return redirect("posts:follow_index")
+
+
+@login_required
+@require_POST
+def follow_bulk(request):
+    usernames = request.POST.getlist("username")[:settings.FOLLOW_BULK_LIMIT]
+    author_ids = User.objects.filter(
+        username__in=usernames).values_list("pk", flat=True)
+    if request.POST.get("action") == "unfollow":
+        Follow.objects.unfollow(request.user, author_ids)
+    else:
+        Follow.objects.follow(request.user, author_ids)
+    invalidate_follow_feed([request.user.pk])
     return redirect("posts:follow_index")
+
+
+@login_required
+def group_subscribe(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    GroupSubscription.objects.bulk_create(
+        [GroupSubscription(user=request.user, group=group)],
+        ignore_conflicts=True
+    )
+    return redirect("posts:group_list", slug=slug)
+
+
+@login_required
+def group_unsubscribe(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    group.subscribers.filter(user=request.user).delete()
+    return redirect("posts:group_list", slug=slug)
+
+
+@login_required
+@query_budget(6)
+# Каждый источник ленты читается своим запросом по индексу.
+@allow_repeated_queries
+def feed(request):
+    posts, next_cursor = merged_feed(
+        request.user,
+        settings.COUNT_POSTS,
+        decode_cursor(request.GET.get("after"))
+    )
+    context = {
+        "posts": posts,
+        "next_cursor": next_cursor
+    }
+    return render(request, "posts/feed.html", context)
@@ -0,0 +1,6 @@
+// Заменяет заглушки <span data-fragment="..."> личными частями страницы.
+document.querySelectorAll("[data-fragment]").forEach(function (element) {
+  fetch(element.dataset.fragment, {credentials: "same-origin"})
+    .then(function (response) { return response.text(); })
+    .then(function (html) { element.outerHTML = html; });
+});
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+User = get_user_model()
+
+
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="user", password="old-secret-42")
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_user_and_session_read_from_cache(self):
+        url = reverse("about:author")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context["user"], self.user)
+        self.assertEqual(len(queries), 0)
+
+    def test_password_change_logs_out_other_sessions(self):
+        other = Client()
+        other.force_login(self.user)
+        url = reverse("posts:post_create")
+        self.assertEqual(other.get(url).status_code, 200)
+        self.client.post(reverse("users:password_change_form"), {
+            "old_password": "old-secret-42",
+            "new_password1": "new-secret-42",
+            "new_password2": "new-secret-42",
+        })
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertRedirects(
+            other.get(url), f"{reverse('users:login')}?next={url}")
+
+    def test_deactivated_user_logged_out_at_once(self):
+        url = reverse("posts:post_create")
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertRedirects(
+            self.client.get(url), f"{reverse('users:login')}?next={url}")
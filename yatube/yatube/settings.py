@@ -1,4 +1,5 @@
 import os
+from importlib.util import find_spec
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -22,6 +23,26 @@ ALLOWED_HOSTS = [
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Server-Timing и строки лога yatube.timing с замерами каждого запроса.
+SERVER_TIMING = DEBUG
+
+# Ответы меньше COMPRESS_MIN_SIZE байт не сжимаются; MINIFY_HTML
+# схлопывает пробелы в HTML перед сжатием.
+COMPRESS_MIN_SIZE = 1024
+MINIFY_HTML = not DEBUG
+
+# Бюджеты SQL-запросов представлений и поиск N+1: raise, warn или off.
+# Тесты core.test_runner.TestRunner запускает с raise и с файловыми
+# кешами во временном каталоге.
+QUERY_BUDGETS = 'warn' if DEBUG else 'off'
+TEST_RUNNER = 'core.test_runner.TestRunner'
+N_PLUS_ONE_THRESHOLD = 5
+# KV-хранилище sorl и справочник шардов авторов обращаются к БД только
+# при холодном кеше, выдача id при шардах — служебная запись.
+QUERY_BUDGET_IGNORE = (
+    'thumbnail_kvstore', 'posts_authorshard', 'posts_ticket',
+)
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -29,6 +50,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -39,6 +61,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.NPlusOneMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.replicas.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,23 +77,57 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Производственный профиль: кешированный загрузчик разбирает шаблон один
+# раз на процесс, а wsgi.py компилирует все шаблоны при старте воркера.
+TEMPLATE_CACHE = not DEBUG
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATE_CACHE:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.personalization.personalization',
             ],
         },
     },
 ]
 
+# Где выводятся части страниц, зависящие от пользователя (шапка, кнопки
+# подписки и редактирования, форма комментария): 'inline' — в самой
+# странице, 'esi' — тегами <esi:include> для прокси, 'js' — заглушками,
+# которые заполняет браузер. В режимах 'esi' и 'js' страницы кешируются
+# одной записью на всех пользователей.
+PERSONALIZATION = 'inline'
+
+# Необязательный движок Jinja2 для горячих шаблонов лент. Маршруты из
+# JINJA2_ROUTES рендерятся им, если пакет jinja2 установлен.
+JINJA2_ROUTES = []
+if find_spec('jinja2'):
+    TEMPLATES.append({
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'NAME': 'jinja2',
+        'DIRS': [os.path.join(BASE_DIR, 'jinja2')],
+        'OPTIONS': {
+            'environment': 'core.jinja2.environment',
+            'context_processors': TEMPLATES[0]['OPTIONS'][
+                'context_processors'],
+        },
+    })
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
@@ -78,9 +138,84 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 0 if DEBUG else 60,
     }
 }
 
+# Профиль SQLite для продакшена, применяется к каждому новому соединению.
+# В WAL писатель не блокирует читателей, synchronous=NORMAL в WAL не
+# теряет целостность при сбое, busy_timeout ждёт блокировку вместо
+# ошибки "database is locked".
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 2 ** 20,
+    'cache_size': -64 * 2 ** 10,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+SQLITE_PRAGMAS = {} if DEBUG else SQLITE_PRODUCTION_PRAGMAS
+
+# Реплики для чтения лент: копии default, которые обновляет команда
+# sync_replicas. Клиент, записавший что-то, REPLICA_STICKY_SECONDS
+# читает с основной базы.
+SQLITE_REPLICAS = 0
+DATABASE_REPLICAS = []
+for number in range(SQLITE_REPLICAS):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.replica{number}.sqlite3'),
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+REPLICA_STICKY_SECONDS = 10
+
+# Шарды постов: посты и комментарии автора лежат в одной из баз
+# DATABASE_SHARDS — по хешу id автора или по справочнику AuthorShard.
+# Ленты собираются со всех шардов. Шарды мигрируют отдельно
+# (migrate --database shardN), посты по ним раскладывает reshard_posts.
+SQLITE_SHARDS = 0
+DATABASE_SHARDS = []
+for number in range(SQLITE_SHARDS):
+    DATABASES[f'shard{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.shard{number}.sqlite3'),
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+    }
+    DATABASE_SHARDS.append(f'shard{number}')
+
+# Архив: посты старше ARCHIVE_AFTER_DAYS дней вместе с комментариями
+# команда archive_posts переносит в отдельную базу, и горячие таблицы и
+# их индексы не растут. Архив читают профиль, страница поста и выгрузка,
+# но не ленты. Мигрирует отдельно: migrate --database archive.
+SQLITE_ARCHIVE = False
+ARCHIVE_DATABASE = None
+ARCHIVE_AFTER_DAYS = 365
+if SQLITE_ARCHIVE:
+    DATABASES['archive'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.archive.sqlite3'),
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+    }
+    ARCHIVE_DATABASE = 'archive'
+DATABASE_ROUTERS = [
+    'posts.shards.ShardRouter',
+    'core.replicas.ReplicaRouter',
+]
+
+
+# Сессии читаются из своего кеша, а в БД изменения пишутся не чаще раза
+# в SESSION_WRITE_BEHIND секунд (новые сессии, вход и выход — сразу).
+# Пользователь сессии кешируется на AUTH_USER_CACHE_TIMEOUT секунд и
+# сбрасывается при сохранении, в том числе при смене пароля.
+SESSION_ENGINE = 'core.sessions'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_COOKIE_AGE = 60 * 60 * 24 * 14
+SESSION_WRITE_BEHIND = 60
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+AUTH_USER_CACHE_TIMEOUT = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -122,6 +257,12 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'), )
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# Без DEBUG статика собирается collectstatic с хешами в именах и
+# сжатыми копиями и раздаётся самим приложением (core.static.serve).
+SERVE_STATIC = not DEBUG
+if SERVE_STATIC:
+    STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -131,8 +272,45 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 COUNT_POSTS = 10
 
+FOLLOW_BULK_LIMIT = 100
+
+API_MAX_PAGE_SIZE = 100
+API_BATCH_LIMIT = 100
+
+# Файлы блокировок пересборки страниц (core.stale).
+STALE_LOCK_DIR = os.path.join(BASE_DIR, 'cache', 'locks')
+
+# Локальный LRU каждого процесса перед общим для всех воркеров кешем.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL': 'local',
+        },
+    },
+    'local': {
+        'BACKEND': 'core.cache.CompressedLRUCache',
+        'LOCATION': 'yatube-local',
+        'OPTIONS': {
+            'MAX_BYTES': 32 * 2 ** 20,
+            'COMPRESS_MIN_SIZE': 1024,
+        },
+    },
+    # Без явного MAX_ENTRIES Django держит 300 записей и вытесняет
+    # случайные: страницы, метки и ленты подписок вытесняли бы друг друга.
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    # Отложенные изменения сессий есть только здесь. Истёкшие записи
+    # удаляет purge_sessions; вытеснение начинается только за
+    # MAX_ENTRIES и теряет не больше SESSION_WRITE_BEHIND секунд изменений.
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'sessions'),
+        'TIMEOUT': SESSION_COOKIE_AGE,
+        'OPTIONS': {'MAX_ENTRIES': 10 ** 6},
+    },
 }
@@ -1,7 +1,9 @@
+from core.fragments import fragment
+from core.static import serve
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 
 handler404 = "core.views.page_not_found"
 handler403 = "core.views.csrf_failure"
@@ -12,9 +14,16 @@ urlpatterns = [
     path("auth/", include("users.urls", namespace="users")),
     path("auth/", include("django.contrib.auth.urls")),
     path("", include("posts.urls", namespace="posts")),
-    path("about/", include("about.urls", namespace="about"))
+    path("about/", include("about.urls", namespace="about")),
+    path("api/v1/", include("api.urls", namespace="api")),
+    path("fragments/<slug:name>/", fragment, name="fragment"),
 ]
 
+if settings.SERVE_STATIC:
+    urlpatterns += [re_path(
+        r"^{}(?P<path>.*)$".format(settings.STATIC_URL.lstrip("/")), serve
+    )]
+
 if settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT